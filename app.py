@@ -1,81 +1,29 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
 import os
+import re
+import bisect
 import datetime
-import boto3
 import traceback
 import json
-import numpy as np
-import pymysql
-import pymysql as sql
+import sys
+import tempfile
+import threading
+import time
 from datetime import date, timedelta
 
+from dotenv import load_dotenv
 
-# =========================
-# AWS SECRET FETCH
-# =========================
-
-def fetch_secret(secret_name, region_name='ap-south-1'):
-    try:
-        client = boto3.client("secretsmanager", region_name=region_name)
-        response = client.get_secret_value(SecretId=secret_name)
-        return response["SecretString"]
-
-    except Exception as e:
-        st.error(f"AWS Secrets Error: {str(e)}")
-        st.code(traceback.format_exc())
-        return None
-
-
-# =========================
-# LOAD SECRET
-# =========================
-
-secret_name = "prod/data-analytics/infra"
-
-secret_data = fetch_secret(secret_name)
-
-if secret_data is None:
-    raise Exception("Failed to fetch secret from AWS Secrets Manager")
-
-secret_data = json.loads(secret_data)
-
-
-# =========================
-# DATABASE CONNECTION
-# =========================
-
-db_connection = sql.connect(
-    host=secret_data["DATABASES"]["ANALYTICS"]["HOST"],
-    database=secret_data["DATABASES"]["ANALYTICS"]["NAME"],
-    user=secret_data["DATABASES"]["ANALYTICS"]["USER"],
-    password=secret_data["DATABASES"]["ANALYTICS"]["PASSWORD"]
-)
-
-db_cursor = db_connection.cursor()
-
-
-# =========================
-# DATA FETCH HELPER
-# =========================
-
-def get_data(query):
-    db_cursor.execute(query)
-    field_names = [i[0] for i in db_cursor.description]
-    table_rows = db_cursor.fetchall()
-    df = pd.DataFrame(table_rows, columns=field_names)
-    return df
-
+# pandas / numpy / plotly are imported after the login gate, and boto3,
+# pymysql, pyarrow and xlsxwriter inside the helpers that use them, so the
+# login page renders without loading them or touching AWS / MySQL.
 
-pd.set_option('display.max_rows', 500)
-pd.set_option('display.max_columns', 500)
-pd.set_option('display.width', 1000)
+# Local / offline runs: DB credentials and settings can come from a .env file
+load_dotenv()
 
 
 # ================= PAGE CONFIG =================
 st.set_page_config(
-    page_title="IBL Credit Card Activation",
+    page_title="Credit Card Activation",
     layout="wide",
     initial_sidebar_state="collapsed"
 )
@@ -156,22 +104,76 @@ html, body, [class*="css"] {{
 </style>
 """, unsafe_allow_html=True)
 
+# ================================================================
+# PARTNERS
+# ================================================================
+# One process serves every partner. A partner is configuration only:
+# tables, column mapping, users, secret and branding. The data engine,
+# connection pool and caches below are shared and keyed by partner id.
+# More partners (same shape) can be added from a JSON file named by
+# IBL_PARTNERS_FILE; a partner id there replaces the built-in entry.
+PARTNERS = {
+    "ibl": {
+        "name": "IBL BANK",
+        "title": "Credit Card Activation Dashboard",
+        "source": "IBL Bank",
+        "secret_name": os.getenv(
+            "IBL_SECRET_NAME", "prod/data-analytics/infra"
+        ),
+        # key under DATABASES in the secret, and env override prefix
+        "database": "ANALYTICS",
+        "env_prefix": "ANALYTICS_DB",
+        "tables": {
+            "external": "Data_IBL_Dashboard_1",
+            "campaigns": "Data_IBL_Dashboard_3",
+        },
+        # source column -> dashboard column, applied before preparation
+        "columns": {},
+        "users": {
+            "admin":           "admin@7860",
+            "Sweta_Ganguly":   "ibl_cce@123",
+            "Prithwish_Ray":   "ibl_cce@123",
+            "Urvish_Bhimani": "ibl_cce@123"
+        },
+        # profiler access; sees only this partner's saved profiles
+        "admins": ["admin"],
+        "monthly_summary": {
+            "Month": ["Jul'25", "Aug'25", "Sep'25", "Nov'25", "Dec'25"],
+            "Sourced": [65622, 60691, 45932, 45257, 33801],
+            "Activated": [59243, 55731, 37846, 41670, 30805],
+        },
+    },
+}
+
+PARTNERS_FILE = os.getenv("IBL_PARTNERS_FILE")
+
+if PARTNERS_FILE:
+    with open(PARTNERS_FILE) as f:
+        PARTNERS.update(json.load(f))
+
+
 # ================================================================
 # AUTH
 # ================================================================
+# Usernames must be unique across partners: the login decides the partner.
+USER_PARTNERS = {}
+
+for _partner, _cfg in PARTNERS.items():
+    for _username in _cfg["users"]:
+        if _username in USER_PARTNERS:
+            raise ValueError(
+                f"User '{_username}' is defined for both "
+                f"'{USER_PARTNERS[_username]}' and '{_partner}'"
+            )
 
-USERS = {
-    "admin":"admin",
-    "admin":           "admin@7860",
-    "Sweta_Ganguly":   "ibl_cce@123",
-    "Prithwish_Ray":   "ibl_cce@123",
-    "Urvish_Bhimani": "ibl_cce@123"
-}
+        USER_PARTNERS[_username] = _partner
 
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
 if "username" not in st.session_state:
     st.session_state.username = ""
+if "partner" not in st.session_state:
+    st.session_state.partner = ""
 
 
 def login_page():
@@ -187,18 +189,29 @@ def login_page():
             submitted = st.form_submit_button("Sign In", use_container_width=True)
 
             if submitted:
-                if username in USERS and USERS[username] == password:
+                partner = USER_PARTNERS.get(username)
+
+                if (
+                    partner is not None
+                    and PARTNERS[partner]["users"][username] == password
+                ):
                     st.session_state.authenticated = True
                     st.session_state.username = username
+                    st.session_state.partner = partner
                     st.rerun()
                 else:
                     st.error("Invalid username or password.")
 
 
-if not st.session_state.authenticated:
+if (
+    not st.session_state.authenticated
+    or st.session_state.partner not in PARTNERS
+):
     login_page()
     st.stop()
 
+partner = st.session_state.partner
+partner_cfg = PARTNERS[partner]
 
 
 
@@ -213,13 +226,13 @@ st.markdown(f"""
 
 <div style="background:{C_BLUE};color:white;font-size:11px;font-weight:700;
 letter-spacing:1px;padding:6px 10px;border-radius:2px;">
-IBL BANK
+{partner_cfg["name"]}
 </div>
 
 <div>
 <div class="dash-header" style="background:transparent;padding:0;margin:0;">
 <h1 style="color:white;font-size:18px;font-weight:700;margin:0;">
-Credit Card Activation Dashboard
+{partner_cfg["title"]}
 </h1>
 </div>
 
@@ -252,364 +265,1900 @@ with st.sidebar:
 
 st.markdown("<div style='height:24px'></div>", unsafe_allow_html=True)
 
+
 # ================================================================
-# HELPER: chart layout defaults
+# PROFILING (admin only)
 # ================================================================
-CHART_LAYOUT = dict(
-    template="simple_white",
-    plot_bgcolor=C_SURFACE,
-    paper_bgcolor=C_SURFACE,
-    font=dict(family="Inter, sans-serif", color=C_TEXT, size=12),
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1,
-        font=dict(size=11),
-    ),
-    margin=dict(l=0, r=0, t=10, b=10),
+# "Profile next rerun" (sidebar) or ?profile=1 arms a stack sampler for
+# one full script run. Each run is saved under IBL_PROFILE_DIR/<partner> as
+# folded stacks, a flame-graph HTML and a JSON summary tagged with the
+# session's filter state. Admins are per partner (partner config "admins").
+PROFILE_DIR = os.getenv(
+    "IBL_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"),
 )
 
-TABLE_HEADER_STYLE = [
-    {
-        "selector": "th",
-        "props": [
-            ("background-color", C_NAVY),
-            ("color", "white"),
-            ("font-weight", "700"),
-            ("text-align", "center"),
-            ("padding", "10px 14px"),
-            ("font-size", "12px"),
-            ("letter-spacing", "0.5px"),
-            ("text-transform", "uppercase"),
-        ],
-    },
-    {
-        "selector": "td",
-        "props": [
-            ("padding", "9px 14px"),
-            ("border-bottom", f"1px solid {C_BORDER}"),
-            ("font-size", "13px"),
-        ],
-    },
-    {
-        "selector": "tr:last-child td",
-        "props": [
-            ("background-color", "#EEF3FB"),
-            ("font-weight", "700"),
-        ],
-    },
-    {
-        "selector": "tr:hover td",
-        "props": [
-            ("background-color", "#F0F7FF"),
-        ],
-    },
-]
+partner_profile_dir = os.path.join(PROFILE_DIR, partner)
+
+PROFILE_INTERVAL_SECONDS = 0.005
+
+# backstop for a run whose session goes away before it can be closed
+PROFILE_MAX_SECONDS = 300
+
+is_admin = st.session_state.username in partner_cfg.get("admins", ())
+
+if is_admin and st.query_params.get("profile") == "1":
+    st.session_state.profile_armed = True
+    del st.query_params["profile"]
 
-# ================================================================
-# SECTION 1 : MONTHLY ACTIVATION SUMMARY
-# ================================================================
-with st.expander("Monthly Activation Summary", expanded=True):
 
-    data = {
-        "Month": ["Jul'25", "Aug'25", "Sep'25", "Nov'25", "Dec'25"],
-        "Sourced": [65622, 60691, 45932, 45257, 33801],
-        "Activated": [59243, 55731, 37846, 41670, 30805],
+def start_sampler():
+    # Samples the script thread's stack; app.py frames keep their current
+    # line so time spent at module level is attributed to the section.
+    target = threading.get_ident()
+    script = os.path.abspath(__file__)
+
+    run = {
+        "stacks": {},
+        "stop": threading.Event(),
+        "started": time.perf_counter(),
     }
 
-    df_summary = pd.DataFrame(data)
-    df_summary["Activated %"] = round(
-        (df_summary["Activated"] / df_summary["Sourced"]) * 100, 2
-    )
+    def sample():
+        while not run["stop"].wait(PROFILE_INTERVAL_SECONDS):
+            if time.perf_counter() - run["started"] > PROFILE_MAX_SECONDS:
+                break
 
-    col1, col2 = st.columns([1.3, 1.5])
+            frame = sys._current_frames().get(target)
+            stack = []
+            top = 0
 
-    with col1:
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename == script:
+                    stack.append(f"{code.co_name} (app.py:{frame.f_lineno})")
+                    top = len(stack)
+                else:
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                        f":{code.co_firstlineno})"
+                    )
+                frame = frame.f_back
 
-        styled = (
-            df_summary.style.format(
-                {
-                    "Sourced": "{:,.0f}",
-                    "Activated": "{:,.0f}",
-                    "Activated %": "{:.2f}%",
-                }
-            )
-            .set_properties(**{"text-align": "center", "font-size": "13px"})
-            .set_table_styles(TABLE_HEADER_STYLE)
-            .hide(axis="index")
-        )
+            if top == 0:
+                continue
 
-        st.dataframe(styled, use_container_width=True, hide_index=True, height=230)
+            # drop the Streamlit runner frames above the script itself
+            key = ";".join(reversed(stack[:top]))
+            run["stacks"][key] = run["stacks"].get(key, 0) + 1
 
-    with col2:
+    run["thread"] = threading.Thread(target=sample, daemon=True)
+    run["thread"].start()
 
-        fig = go.Figure()
+    return run
 
-        fig.add_trace(
-            go.Bar(
-                x=df_summary["Month"],
-                y=df_summary["Sourced"],
-                name="Sourced",
-                marker_color=C_NAVY,
-                marker_line_width=0,
-                text=df_summary["Sourced"].apply(lambda x: f"{x:,.0f}"),
-                textposition="outside",
-                textfont=dict(size=10, color=C_NAVY),
-            )
-        )
 
-        fig.add_trace(
-            go.Bar(
-                x=df_summary["Month"],
-                y=df_summary["Activated"],
-                name="Activated",
-                marker_color=C_BLUE,
-                marker_line_width=0,
-                text=df_summary["Activated"].apply(lambda x: f"{x:,.0f}"),
-                textposition="outside",
-                textfont=dict(size=10, color=C_BLUE),
-            )
-        )
+def _flame_figure(stacks):
+    # Icicle chart of the folded stacks, root at the bottom (flame graph)
+    import plotly.graph_objects as go
 
-        fig.add_trace(
-            go.Scatter(
-                x=df_summary["Month"],
-                y=df_summary["Activated %"],
-                name="Activation %",
-                mode="lines+markers+text",
-                yaxis="y2",
-                line=dict(color=C_SKY, width=2.5),
-                marker=dict(size=7, color=C_SKY),
-                text=df_summary["Activated %"].apply(lambda x: f"{x}%"),
-                textposition="top center",
-                textfont=dict(size=10, color=C_SKY),
-            )
-        )
+    totals = {}
 
-        fig.update_layout(
-            barmode="group",
-            height=300,
-            yaxis=dict(
-                title="Volume",
-                title_font=dict(size=11),
-                tickfont=dict(size=10),
-                gridcolor="#F0F0F0",
-            ),
-            yaxis2=dict(
-                title="Activation %",
-                overlaying="y",
-                side="right",
-                range=[80, 100],
-                ticksuffix="%",
-                title_font=dict(size=11),
-                tickfont=dict(size=10),
-            ),
-            **CHART_LAYOUT,
+    for key, count in stacks.items():
+        frames = key.split(";")
+        for depth in range(1, len(frames) + 1):
+            path = ";".join(frames[:depth])
+            totals[path] = totals.get(path, 0) + count
+
+    ids = list(totals)
+
+    fig = go.Figure(
+        go.Icicle(
+            ids=ids,
+            labels=[i.rsplit(";", 1)[-1] for i in ids],
+            parents=[i.rsplit(";", 1)[0] if ";" in i else "" for i in ids],
+            values=[totals[i] for i in ids],
+            branchvalues="total",
+            tiling=dict(orientation="v", flip="y"),
+            hovertemplate="%{label}<br>%{value} samples<extra></extra>",
         )
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=30, b=0), height=900)
 
-        st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-    st.caption("*Data Source: IBL Bank*")
 
-# ================================================================
-# SECTION 2 : DAY-WISE ACTIVATION SUMMARY
-# ================================================================
-df_external = get_data(
-    """
-SELECT * FROM Data_IBL_Dashboard_1
-"""
-)
+def finish_sampler(run, username, complete=True):
+    run["stop"].set()
+    run["thread"].join()
 
-df_external["AccountOpeningDate"] = pd.to_datetime(
-    df_external["AccountOpeningDate"]
-).dt.date
-df_external["ReceivedDate"] = pd.to_datetime(df_external["ReceivedDate"]).dt.date
+    elapsed = time.perf_counter() - run["started"]
+    stacks = run["stacks"]
 
-mask = df_external["ReceivedDate"] < df_external["AccountOpeningDate"]
-df_external.loc[mask, "ReceivedDate"] = df_external.loc[
-    mask, "AccountOpeningDate"
-]
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(partner_profile_dir, f"{stamp}_{username}")
 
+    os.makedirs(partner_profile_dir, exist_ok=True)
 
-def fmt_month(m):
-    try:
-        return datetime.datetime.strptime(str(int(m)), "%Y%m").strftime("%b'%y")
-    except:
-        return str(m)
+    with open(base + ".folded", "w") as f:
+        for key, count in sorted(stacks.items()):
+            f.write(f"{key} {count}\n")
 
+    fig = _flame_figure(stacks)
+    fig.update_layout(
+        title=f"{stamp} · {username} · {elapsed:.2f}s"
+        + ("" if complete else " · ended early")
+    )
+    fig.write_html(base + ".html", include_plotlyjs="cdn")
+
+    self_samples = {}
+    for key, count in stacks.items():
+        leaf = key.rsplit(";", 1)[-1]
+        self_samples[leaf] = self_samples.get(leaf, 0) + count
+
+    filters = {
+        k: v
+        for k, v in st.session_state.items()
+        if k not in ("authenticated", "username", "profile_armed", "profile_run")
+        and not k.startswith("export_")
+    }
 
-df_external["MonthYearLabel"] = df_external["MonthYear"].apply(fmt_month)
+    with open(base + ".json", "w") as f:
+        json.dump(
+            {
+                "user": username,
+                "started": stamp,
+                "seconds": round(elapsed, 3),
+                "complete": complete,
+                "samples": sum(stacks.values()),
+                "filters": filters,
+                "top_self": sorted(
+                    self_samples.items(), key=lambda kv: -kv[1]
+                )[:15],
+            },
+            f,
+            indent=2,
+            default=str,
+        )
 
-with st.expander("Day-wise Activation Summary", expanded=True):
+    return base
 
-    fa, fb = st.columns([0.8, 3.2])
 
-    with fa:
+def list_profiles():
+    if not os.path.isdir(partner_profile_dir):
+        return []
 
-        desc_options = ["All"] + sorted(
-            df_external["ProductDesc"].dropna().unique().tolist()
-        )
+    return sorted(
+        (
+            f[:-5]
+            for f in os.listdir(partner_profile_dir)
+            if f.endswith(".json")
+        ),
+        reverse=True,
+    )
 
-        product_filter = st.selectbox(
-            "Product",
-            options=desc_options,
-            index=0,
-            key="product_select",
-        )
 
-    with fb:
+# The active run lives in session state. A profiled run that ended early
+# (st.rerun, st.stop, an exception or a superseded rerun) never reaches the
+# end of the script, so it is closed and saved here, on the next run.
+if "profile_run" in st.session_state:
+    finish_sampler(
+        st.session_state.pop("profile_run"),
+        st.session_state.username,
+        complete=False,
+    )
+    st.session_state.profile_armed = False
 
-        st.markdown(
-            '<div class="filter-label">Month Year</div>',
-            unsafe_allow_html=True,
-        )
+if is_admin and st.session_state.get("profile_armed"):
+    st.session_state.profile_run = start_sampler()
 
-        month_label_map = dict(
-            zip(df_external["MonthYearLabel"], df_external["MonthYear"])
-        )
 
-        month_num_to_label = {v: k for k, v in month_label_map.items()}
+# ================================================================
+# HEAVY IMPORTS (post-login only)
+# ================================================================
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
 
-        _my_order = (
-            df_external[["MonthYearLabel", "MonthYear"]]
-            .drop_duplicates()
-            .dropna()
-            .sort_values("MonthYear")
-        )
+pd.set_option('display.max_rows', 500)
+pd.set_option('display.max_columns', 500)
+pd.set_option('display.width', 1000)
 
-        month_labels_sorted = _my_order["MonthYearLabel"].tolist()
 
-        latest_month_label = month_num_to_label.get(
-            df_external["MonthYear"].max()
-        )
+# =========================
+# AWS SECRET FETCH
+# =========================
 
-        month_filter_labels = st.pills(
-            "month_year",
-            options=month_labels_sorted,
-            default=[latest_month_label] if latest_month_label else None,
-            selection_mode="multi",
-            label_visibility="collapsed",
-            key="month_pills",
-        )
+SECRET_TTL_SECONDS = int(os.getenv("IBL_SECRET_TTL_SECONDS", "3600"))
 
-        month_filter = (
-            [month_label_map[l] for l in month_filter_labels]
-            if month_filter_labels
-            else []
-        )
+# .env / environment override: when all four <env_prefix>_* variables are
+# set for a partner AWS is never called
+ENV_DB_KEYS = ["HOST", "NAME", "USER", "PASSWORD"]
 
-    df_filtered = df_external.copy()
 
-    if product_filter != "All":
-        df_filtered = df_filtered[
-            df_filtered["ProductDesc"] == product_filter
-        ]
+def fetch_secret(secret_name, region_name='ap-south-1', report=True):
+    try:
+        import boto3
 
-    if month_filter:
-        df_filtered = df_filtered[
-            df_filtered["MonthYear"].isin(month_filter)
-        ]
+        client = boto3.client("secretsmanager", region_name=region_name)
+        response = client.get_secret_value(SecretId=secret_name)
+        return response["SecretString"]
 
-    c1, c2, c3 = st.columns([2, 3, 2])
+    except Exception as e:
+        if report:
+            st.error(f"AWS Secrets Error: {str(e)}")
+            st.code(traceback.format_exc())
+        return None
 
-    with c1:
 
-        st.markdown(
-            '<div class="filter-label">Date View</div>',
-            unsafe_allow_html=True,
-        )
+def secret_from_env(cfg):
+    values = {k: os.getenv(f"{cfg['env_prefix']}_{k}") for k in ENV_DB_KEYS}
 
-        date_view = st.pills(
-            "date_view",
-            ["Account Opening Date", "Received Date"],
-            default="Account Opening Date",
-            selection_mode="single",
-            label_visibility="collapsed",
-            key="date_view_pills",
-        )
+    if not all(values.values()):
+        return None
 
-    with c2:
+    return {"DATABASES": {cfg["database"]: values}}
 
-        st.markdown(
-            '<div class="filter-label">Activation View</div>',
-            unsafe_allow_html=True,
-        )
 
-        activation_view = st.pills(
-            "activation_view",
-            [
-                "Overall Activated",
-                "Creditas Activated",
-                "Bank Activated",
-            ],
-            default="Overall Activated",
-            selection_mode="single",
-            label_visibility="collapsed",
-            key="act_view_pills",
-        )
+@st.cache_resource(show_spinner=False)
+def secret_store(secret_name):
+    # One per secret per process, shared by every session
+    return {
+        "value": None,
+        "fetched_at": 0.0,
+        "refreshing": False,
+        "lock": threading.Lock(),
+    }
 
-    with c3:
 
-        st.markdown(
-            '<div class="filter-label">Metric</div>',
-            unsafe_allow_html=True,
-        )
+def _refresh_secret(store, secret_name):
+    try:
+        raw = fetch_secret(secret_name, report=False)
+        if raw is not None:
+            with store["lock"]:
+                store["value"] = json.loads(raw)
+                store["fetched_at"] = time.time()
+    finally:
+        store["refreshing"] = False
 
-        view_mode = st.pills(
-            "view_mode",
-            ["Count", "Activation %"],
-            default="Count",
-            selection_mode="single",
-            label_visibility="collapsed",
-            key="view_mode_pills",
-        )
 
-    if activation_view == "Creditas Activated":
-        df_act = df_filtered[
-            df_filtered["CreditasActivated"] >= 1
-        ].copy()
+def get_secret(partner):
+    # Resolved once per process; after the TTL the stale value keeps being
+    # served while a background thread fetches a fresh one.
+    cfg = PARTNERS[partner]
 
-    elif activation_view == "Bank Activated":
-        df_act = df_filtered[
-            df_filtered["BankActivated"] >= 1
-        ].copy()
+    env_secret = secret_from_env(cfg)
+    if env_secret is not None:
+        return env_secret
 
-    else:
-        df_act = df_filtered[
-            df_filtered["OverallActivated"] >= 1
-        ].copy()
+    secret_name = cfg["secret_name"]
+    store = secret_store(secret_name)
 
-    if date_view == "Received Date":
+    with store["lock"]:
+        value = store["value"]
+        stale = time.time() - store["fetched_at"] > SECRET_TTL_SECONDS
 
-        date_col = "ReceivedDate"
+        if value is not None and stale and not store["refreshing"]:
+            store["refreshing"] = True
+            threading.Thread(
+                target=_refresh_secret, args=(store, secret_name), daemon=True
+            ).start()
 
-        if activation_view == "Creditas Activated":
-            act_date_col = "ActivationDate"
+    if value is None:
+        raw = fetch_secret(secret_name)
 
-        elif activation_view == "Bank Activated":
-            act_date_col = "BankActivatedDate"
+        if raw is None:
+            raise Exception("Failed to fetch secret from AWS Secrets Manager")
 
-        else:
-            act_date_col = "OverallActivatedDate"
+        value = json.loads(raw)
 
-        df_rd = df_act.copy()
+        with store["lock"]:
+            store["value"] = value
+            store["fetched_at"] = time.time()
 
-        df_rd["_rcd_dt"] = pd.to_datetime(df_rd["ReceivedDate"])
-        df_rd["_act_dt"] = pd.to_datetime(
-            df_rd[act_date_col],
-            errors="coerce",
-        )
+    return value
 
-        df_rd["_day_rd"] = (
-            (df_rd["_act_dt"] - df_rd["_rcd_dt"])
-            .dt.days.clip(lower=0)
-            .fillna(0)
-            .astype(int)
-        )
 
-        if len(df_rd) > 0:
+def partner_db(partner):
+    return get_secret(partner)["DATABASES"][PARTNERS[partner]["database"]]
+
+
+# =========================
+# DATABASE CONNECTION
+# =========================
+
+# Per-query deadline; enforced server-side (MAX_EXECUTION_TIME hint), by the
+# waiting script (KILL QUERY) and by the socket read timeout as a backstop.
+QUERY_DEADLINE_SECONDS = float(os.getenv("IBL_QUERY_DEADLINE_SECONDS", "30"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_db_connection(host, database, user, password):
+    # Cached per credential set, so a rotated secret opens a new connection
+    # and partners on the same database share one
+    import pymysql
+
+    return pymysql.connect(
+        host=host,
+        database=database,
+        user=user,
+        password=password,
+        connect_timeout=10,
+        read_timeout=int(QUERY_DEADLINE_SECONDS) + 15,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def db_lock(host, database, user, password):
+    # pymysql connections are not thread-safe; sessions run on threads.
+    # One lock per connection, so partners on other databases don't wait.
+    return threading.Lock()
+
+
+def kill_query(db, thread_id):
+    # Cancels a running statement from a separate short-lived connection
+    import pymysql
+
+    try:
+        killer = pymysql.connect(
+            host=db["HOST"],
+            database=db["NAME"],
+            user=db["USER"],
+            password=db["PASSWORD"],
+            connect_timeout=5,
+        )
+        with killer.cursor() as cur:
+            cur.execute(f"KILL QUERY {int(thread_id)}")
+        killer.close()
+    except Exception:
+        pass
+
+
+def with_deadline_hint(query, deadline):
+    q = query.strip()
+
+    if q[:6].upper() != "SELECT":
+        return q
+
+    return f"SELECT /*+ MAX_EXECUTION_TIME({int(deadline * 1000)}) */{q[6:]}"
+
+
+# =========================
+# DATA FETCH HELPER
+# =========================
+
+def _execute(db, query, deadline, state, args=None):
+    creds = (db["HOST"], db["NAME"], db["USER"], db["PASSWORD"])
+    db_connection = get_db_connection(*creds)
+
+    with db_lock(*creds):
+        if state.get("cancelled"):
+            return
+
+        db_connection.ping(reconnect=True)
+        state["thread_id"] = db_connection.thread_id()
+
+        with db_connection.cursor() as db_cursor:
+            db_cursor.execute(with_deadline_hint(query, deadline), args)
+            state["fields"] = [i[0] for i in db_cursor.description]
+            state["rows"] = db_cursor.fetchall()
+
+
+def run_query(partner, query, args=None, deadline=QUERY_DEADLINE_SECONDS):
+    # Blocking variant for background threads (no Streamlit calls); bounded
+    # by the server-side deadline hint and the socket read timeout.
+    state = {}
+    _execute(partner_db(partner), query, deadline, state, args)
+
+    return pd.DataFrame(state["rows"], columns=state["fields"])
+
+
+def _fetch(partner, query, deadline):
+    # Runs the query on a worker thread while the script thread waits with
+    # short polls. Each poll updates a placeholder, which is a Streamlit
+    # yield point: a superseded rerun raises there and the in-flight
+    # statement is killed instead of holding the connection.
+    db = partner_db(partner)
+
+    state = {"cancelled": False}
+
+    def work():
+        try:
+            _execute(db, query, deadline, state)
+        except Exception as e:
+            state["error"] = e
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+
+    started = time.time()
+    placeholder = None
+
+    try:
+        while True:
+            worker.join(0.25)
+
+            if not worker.is_alive():
+                break
+
+            elapsed = time.time() - started
+
+            if elapsed > deadline:
+                raise TimeoutError(
+                    f"Query exceeded the {deadline:.0f}s deadline"
+                )
+
+            if placeholder is None:
+                placeholder = st.empty()
+
+            placeholder.caption(f"Loading data… {elapsed:.0f}s")
+
+    except BaseException:
+        state["cancelled"] = True
+        if worker.is_alive() and "thread_id" in state:
+            kill_query(db, state["thread_id"])
+        raise
+
+    finally:
+        if placeholder is not None:
+            placeholder.empty()
+
+    if "error" in state:
+        raise state["error"]
+
+    return pd.DataFrame(state["rows"], columns=state["fields"])
+
+
+def get_data(partner, query, deadline=QUERY_DEADLINE_SECONDS):
+    # Only the first load of a table runs here; once a snapshot exists a
+    # failed refresh keeps serving it (see stale_data_warning).
+    try:
+        return _fetch(partner, query, deadline)
+
+    except Exception as e:
+        st.error(f"Database Error: {str(e)}")
+        st.stop()
+
+
+# ================================================================
+# DATA STORE + BACKGROUND REFRESH
+# ================================================================
+# Each table lives in a process-wide snapshot that user reruns read without
+# touching the DB. A daemon thread polls a cheap watermark and rebuilds a
+# snapshot when it moves (or the interval lapses), then swaps it in.
+REFRESH_INTERVAL_SECONDS = int(os.getenv("IBL_REFRESH_INTERVAL_SECONDS", "900"))
+WATERMARK_POLL_SECONDS = int(os.getenv("IBL_WATERMARK_POLL_SECONDS", "60"))
+
+
+def fmt_month(m):
+    try:
+        return datetime.datetime.strptime(str(int(m)), "%Y%m").strftime("%b'%y")
+    except:
+        return str(m)
+
+
+def prepare_external(df):
+    df["AccountOpeningDate"] = pd.to_datetime(df["AccountOpeningDate"]).dt.date
+    df["ReceivedDate"] = pd.to_datetime(df["ReceivedDate"]).dt.date
+
+    mask = df["ReceivedDate"] < df["AccountOpeningDate"]
+    df.loc[mask, "ReceivedDate"] = df.loc[mask, "AccountOpeningDate"]
+
+    df["MonthYearLabel"] = df["MonthYear"].apply(fmt_month)
+
+    return df
+
+
+def prepare_campaigns(df):
+    df["ScheduleDate"] = pd.to_datetime(df["ScheduleDate"])
+    df["_MonthNum"] = df["ScheduleDate"].dt.strftime("%Y%m").astype(int)
+    df["_MonthLabel"] = df["ScheduleDate"].dt.strftime("%b'%y")
+
+    return df
+
+
+# table key -> preparation; the physical table comes from the partner
+DATA_TABLES = {
+    "external": prepare_external,
+    "campaigns": prepare_campaigns,
+}
+
+# Activation view -> (activated count column, activation date column)
+ACTIVATION_VIEWS = {
+    "Overall Activated": ("OverallActivated", "OverallActivatedDate"),
+    "Creditas Activated": ("CreditasActivated", "ActivationDate"),
+    "Bank Activated": ("BankActivated", "BankActivatedDate"),
+}
+
+
+# key -> callables run as hook(partner, df) with each newly published frame
+SNAPSHOT_HOOKS = {}
+
+
+@st.cache_resource(show_spinner=False)
+def data_store():
+    # Snapshots are keyed (partner, key). Versions come from one process-wide
+    # counter, so version-keyed caches never collide between partners.
+    return {
+        "tables": {},
+        "versions": 0,
+        "lock": threading.Lock(),
+        "cold_lock": threading.Lock(),
+        "refresher": None,
+    }
+
+
+def load_table(fetch, partner, key):
+    cfg = PARTNERS[partner]
+    df = fetch(partner, f"SELECT * FROM {cfg['tables'][key]}")
+
+    return DATA_TABLES[key](df.rename(columns=cfg.get("columns", {})))
+
+
+def table_watermark(partner, table):
+    # Changes whenever the table is written; None if not available
+    try:
+        wm = run_query(
+            partner,
+            "SELECT UPDATE_TIME, TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,),
+        )
+        return tuple(wm.iloc[0].astype(str)) if len(wm) else None
+    except Exception:
+        return None
+
+
+def frame_fingerprint(df):
+    try:
+        return int(pd.util.hash_pandas_object(df, index=False).sum())
+    except Exception:
+        return None
+
+
+def publish_snapshot(store, partner, key, df, duration, watermark):
+    # A reload with identical content keeps the current frame and version,
+    # so version-keyed caches stay warm and no new entries pile up.
+    fingerprint = frame_fingerprint(df)
+
+    with store["lock"]:
+        prev = store["tables"].get((partner, key))
+
+        if (
+            prev is not None
+            and fingerprint is not None
+            and prev["fingerprint"] == fingerprint
+        ):
+            store["tables"][(partner, key)] = {
+                **prev,
+                "refreshed_at": time.time(),
+                "duration": duration,
+                "watermark": watermark,
+                "error": None,
+            }
+            return
+
+        store["versions"] += 1
+        store["tables"][(partner, key)] = {
+            "df": df,
+            "version": store["versions"],
+            "fingerprint": fingerprint,
+            "refreshed_at": time.time(),
+            "duration": duration,
+            "watermark": watermark,
+            "error": None,
+        }
+
+    for hook in SNAPSHOT_HOOKS.get(key, ()):
+        try:
+            hook(partner, df)
+        except Exception:
+            traceback.print_exc()
+
+
+def _refresh_loop(store):
+    while True:
+        time.sleep(WATERMARK_POLL_SECONDS)
+
+        # only partners that have been loaded in this process
+        for partner, key in list(store["tables"]):
+            snap = store["tables"][(partner, key)]
+
+            try:
+                watermark = table_watermark(
+                    partner, PARTNERS[partner]["tables"][key]
+                )
+
+                due = (
+                    time.time() - snap["refreshed_at"]
+                    >= REFRESH_INTERVAL_SECONDS
+                    or (watermark is not None and watermark != snap["watermark"])
+                )
+
+                if not due:
+                    continue
+
+                started = time.time()
+                df = load_table(run_query, partner, key)
+                publish_snapshot(
+                    store, partner, key, df, time.time() - started, watermark
+                )
+
+            except Exception as e:
+                with store["lock"]:
+                    store["tables"][(partner, key)] = {**snap, "error": str(e)}
+
+
+def stale_data_warning(snap):
+    if snap["error"]:
+        st.warning(
+            "Live data unavailable ({}). Showing data as of {}.".format(
+                snap["error"],
+                datetime.datetime.fromtimestamp(snap["refreshed_at"]).strftime(
+                    "%d %b %Y %H:%M"
+                ),
+            )
+        )
+
+
+def get_table(partner, key):
+    # Current snapshot for a partner's table. Only the very first load in a
+    # process runs on a user's rerun; after that the refresher keeps it
+    # current.
+    store = data_store()
+    snap = store["tables"].get((partner, key))
+
+    if snap is None:
+        with store["cold_lock"]:
+            snap = store["tables"].get((partner, key))
+
+            if snap is None:
+                watermark = table_watermark(
+                    partner, PARTNERS[partner]["tables"][key]
+                )
+                started = time.time()
+                df = load_table(get_data, partner, key)
+                publish_snapshot(
+                    store, partner, key, df, time.time() - started, watermark
+                )
+                snap = store["tables"][(partner, key)]
+
+    with store["lock"]:
+        if store["refresher"] is None or not store["refresher"].is_alive():
+            store["refresher"] = threading.Thread(
+                target=_refresh_loop, args=(store,), daemon=True
+            )
+            store["refresher"].start()
+
+    return snap
+
+
+# ================================================================
+# ANOMALY MONITOR
+# ================================================================
+# Headless: runs as a snapshot hook, so the refresher keeps it current
+# without any session open. Each ReceivedDate is scored once, when its
+# day-K activation rate (activated within K days of receipt) is complete.
+# Per product x view it keeps an EWMA level, EWMA residual variance and
+# additive weekday offsets, updated only with the newly complete dates.
+ANOMALY_HORIZON_DAYS = int(os.getenv("IBL_ANOMALY_HORIZON_DAYS", "3"))
+ANOMALY_Z = float(os.getenv("IBL_ANOMALY_Z", "3"))
+ANOMALY_ALPHA = 0.1
+ANOMALY_SEASON_ALPHA = 0.2
+ANOMALY_WARMUP = 14
+ANOMALY_MIN_CUID = 20
+ANOMALY_KEEP = 500
+
+ALERT_LOG = os.getenv(
+    "IBL_ALERT_LOG",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "alerts", "anomalies.jsonl"
+    ),
+)
+
+
+def _last_logged_date(partner):
+    # Newest alert date already in ALERT_LOG for this partner (ISO string).
+    # The state below is memory-only, so a new process re-scores the whole
+    # history to rebuild its baselines; only later dates get logged again.
+    last = None
+
+    try:
+        with open(ALERT_LOG) as f:
+            for line in f:
+                try:
+                    a = json.loads(line)
+                except ValueError:
+                    continue
+
+                # lines written before partners existed are IBL's
+                if a.get("partner", "ibl") == partner and (
+                    last is None or a["date"] > last
+                ):
+                    last = a["date"]
+
+    except FileNotFoundError:
+        pass
+
+    return last
+
+
+@st.cache_resource(show_spinner=False)
+def anomaly_state(partner):
+    return {
+        "logged_through": _last_logged_date(partner),
+        "last_date": None,
+        "keys": {},
+        "level": np.zeros(0),
+        "var": np.zeros(0),
+        "n": np.zeros(0, dtype=np.int64),
+        "season": np.zeros((0, 7)),
+        "anomalies": [],
+        "lock": threading.Lock(),
+    }
+
+
+def _day_k_rates(df, rd):
+    # Day-K activation rate per (date, product, view), plus "All" products
+    frames = []
+
+    for view, (flag, act_col) in ACTIVATION_VIEWS.items():
+        lag = (pd.to_datetime(df[act_col], errors="coerce") - rd).dt.days
+
+        part = pd.DataFrame(
+            {
+                "Date": rd.to_numpy(),
+                "Product": df["ProductDesc"].to_numpy(),
+                "Activated": df[flag]
+                .where((df[flag] >= 1) & (lag <= ANOMALY_HORIZON_DAYS), 0)
+                .to_numpy(),
+                "Sourced": df["Total_CUID"].to_numpy(),
+            }
+        )
+
+        by_product = part.groupby(["Date", "Product"], as_index=False)[
+            ["Activated", "Sourced"]
+        ].sum()
+        overall = part.groupby("Date", as_index=False)[
+            ["Activated", "Sourced"]
+        ].sum()
+        overall["Product"] = "All"
+
+        frames.append(pd.concat([by_product, overall]).assign(View=view))
+
+    rates = pd.concat(frames, ignore_index=True)
+    rates = rates[rates["Sourced"] >= ANOMALY_MIN_CUID]
+    rates["Rate"] = rates["Activated"] / rates["Sourced"] * 100
+
+    return rates.sort_values("Date", kind="stable")
+
+
+def _grow_state(state, keys):
+    new = [k for k in keys if k not in state["keys"]]
+
+    for k in new:
+        state["keys"][k] = len(state["keys"])
+
+    if new:
+        state["level"] = np.append(state["level"], np.full(len(new), np.nan))
+        state["var"] = np.append(state["var"], np.zeros(len(new)))
+        state["n"] = np.append(state["n"], np.zeros(len(new), dtype=np.int64))
+        state["season"] = np.vstack([state["season"], np.zeros((len(new), 7))])
+
+
+def update_anomaly_monitor(partner, df):
+    state = anomaly_state(partner)
+
+    with state["lock"]:
+        rd = pd.to_datetime(df["ReceivedDate"])
+        cutoff = rd.max() - pd.Timedelta(days=ANOMALY_HORIZON_DAYS)
+
+        window = rd <= cutoff
+        if state["last_date"] is not None:
+            window &= rd > state["last_date"]
+
+        if not window.any():
+            return []
+
+        rates = _day_k_rates(df[window.to_numpy()], rd[window])
+        found = []
+
+        for day, rows in rates.groupby("Date", sort=True):
+            keys = list(zip(rows["Product"], rows["View"]))
+            _grow_state(state, keys)
+
+            idx = np.array([state["keys"][k] for k in keys])
+            wd = day.weekday()
+
+            x = rows["Rate"].to_numpy()
+            level = state["level"][idx]
+            offset = state["season"][idx, wd]
+            sd = np.sqrt(state["var"][idx])
+            warm = state["n"][idx] >= ANOMALY_WARMUP
+
+            first = np.isnan(level)
+            expected = np.where(first, x, level + offset)
+            resid = x - expected
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z = np.where(warm & (sd > 0), resid / sd, 0.0)
+
+            for i in np.flatnonzero(np.abs(z) >= ANOMALY_Z):
+                found.append(
+                    {
+                        "date": day.date().isoformat(),
+                        "product": keys[i][0],
+                        "view": keys[i][1],
+                        "direction": "drop" if z[i] < 0 else "spike",
+                        "rate": round(float(x[i]), 2),
+                        "expected": round(float(expected[i]), 2),
+                        "z": round(float(z[i]), 2),
+                        "activated": int(rows["Activated"].iloc[i]),
+                        "sourced": int(rows["Sourced"].iloc[i]),
+                    }
+                )
+
+            # flagged points update the baseline clipped to the threshold so
+            # a single bad day does not drag it along
+            limit = np.where(warm & (sd > 0), ANOMALY_Z * sd, np.inf)
+            x_upd = expected + np.clip(resid, -limit, limit)
+
+            new_level = np.where(
+                first, x, level + ANOMALY_ALPHA * (x_upd - offset - level)
+            )
+            state["season"][idx, wd] = np.where(
+                first,
+                0.0,
+                offset + ANOMALY_SEASON_ALPHA * ((x_upd - new_level) - offset),
+            )
+            state["var"][idx] = np.where(
+                first,
+                0.0,
+                state["var"][idx]
+                + ANOMALY_ALPHA * ((x_upd - expected) ** 2 - state["var"][idx]),
+            )
+            state["level"][idx] = new_level
+            state["n"][idx] += 1
+
+        state["last_date"] = cutoff
+        state["anomalies"] = (state["anomalies"] + found)[-ANOMALY_KEEP:]
+
+        logged = state["logged_through"]
+        to_log = [a for a in found if logged is None or a["date"] > logged]
+
+        if to_log:
+            state["logged_through"] = max(a["date"] for a in to_log)
+
+    if to_log:
+        os.makedirs(os.path.dirname(ALERT_LOG), exist_ok=True)
+        with open(ALERT_LOG, "a") as f:
+            for a in to_log:
+                f.write(
+                    json.dumps(
+                        {"logged_at": time.time(), "partner": partner, **a}
+                    )
+                    + "\n"
+                )
+
+    return found
+
+
+SNAPSHOT_HOOKS.setdefault("external", []).append(update_anomaly_monitor)
+
+
+# ================================================================
+# DAILY AGGREGATE SNAPSHOTS
+# ================================================================
+# Each refresh of a partner's external table rewrites today's aggregate
+# snapshot (activation counts per opening date x received date x product)
+# as a small Parquet file under SNAPSHOT_DIR/<partner>, so any two days can
+# be compared without the raw rows.
+SNAPSHOT_DIR = os.getenv(
+    "IBL_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"),
+)
+
+SNAPSHOT_KEYS = ["AccountOpeningDate", "ReceivedDate", "ProductDesc"]
+
+SNAPSHOT_METRICS = [
+    "Total_CUID",
+    "CreditasActivated",
+    "BankActivated",
+    "OverallActivated",
+]
+
+
+def activation_aggregate(df):
+    flags = [f for f, _ in ACTIVATION_VIEWS.values()]
+
+    return (
+        df.assign(**{f: df[f].where(df[f] >= 1, 0) for f in flags})
+        .groupby(SNAPSHOT_KEYS, as_index=False)[SNAPSHOT_METRICS]
+        .sum()
+    )
+
+
+def snapshot_path(partner, day):
+    return os.path.join(SNAPSHOT_DIR, partner, f"activation_{day}.parquet")
+
+
+def write_daily_snapshot(partner, df):
+    path = snapshot_path(partner, f"{datetime.date.today():%Y%m%d}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp = path + ".tmp"
+
+    activation_aggregate(df).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def list_snapshots(partner):
+    folder = os.path.join(SNAPSHOT_DIR, partner)
+
+    if not os.path.isdir(folder):
+        return []
+
+    return sorted(
+        f[len("activation_"):-len(".parquet")]
+        for f in os.listdir(folder)
+        if f.startswith("activation_") and f.endswith(".parquet")
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=16 * len(PARTNERS))
+def load_snapshot(partner, day, mtime):
+    # mtime in the key: today's file is rewritten on every refresh
+    return pd.read_parquet(snapshot_path(partner, day))
+
+
+def snapshot_mtime(partner, day):
+    return os.path.getmtime(snapshot_path(partner, day))
+
+
+@st.cache_data(show_spinner=False, max_entries=16 * len(PARTNERS))
+def diff_snapshots(partner, base_day, compare_day, date_col, mtimes):
+    # Keyed join of two aggregate snapshots rolled up to (date, product)
+    base = load_snapshot(partner, base_day, mtimes[0])
+    compare = load_snapshot(partner, compare_day, mtimes[1])
+
+    keys = [date_col, "ProductDesc"]
+
+    a = base.groupby(keys)[SNAPSHOT_METRICS].sum()
+    b = compare.groupby(keys)[SNAPSHOT_METRICS].sum()
+
+    delta = b.sub(a, fill_value=0)
+    changed = delta[(delta != 0).any(axis=1)]
+
+    out = (
+        a.reindex(changed.index)["OverallActivated"]
+        .fillna(0)
+        .rename("Overall (base)")
+        .to_frame()
+        .join(
+            b.reindex(changed.index)["OverallActivated"]
+            .fillna(0)
+            .rename("Overall (compare)")
+        )
+        .join(changed.add_prefix("Δ "))
+        .reset_index()
+    )
+
+    return out.sort_values(
+        "Δ OverallActivated", key=lambda s: s.abs(), ascending=False
+    )
+
+
+SNAPSHOT_HOOKS.setdefault("external", []).append(write_daily_snapshot)
+
+
+# ================================================================
+# HELPER: chart layout defaults
+# ================================================================
+CHART_LAYOUT = dict(
+    template="simple_white",
+    plot_bgcolor=C_SURFACE,
+    paper_bgcolor=C_SURFACE,
+    font=dict(family="Inter, sans-serif", color=C_TEXT, size=12),
+    legend=dict(
+        orientation="h",
+        yanchor="bottom",
+        y=1.02,
+        xanchor="right",
+        x=1,
+        font=dict(size=11),
+    ),
+    margin=dict(l=0, r=0, t=10, b=10),
+)
+
+# ================================================================
+# HELPER: table payloads
+# ================================================================
+# Tables reach the browser as Arrow. Numeric and date columns stay typed
+# and are formatted client-side by column_config; a Total row is sent as
+# its own one-row table instead of turning every body column into object.
+# For admins (or IBL_PAYLOAD_STATS=1) each table's Arrow size and
+# serialization time is recorded and listed in the sidebar.
+MEASURE_PAYLOADS = is_admin or os.getenv("IBL_PAYLOAD_STATS") == "1"
+
+payload_stats = []
+
+
+def record_payload(name, df):
+    import pyarrow as pa
+
+    try:
+        started = time.perf_counter()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        size = sink.getvalue().size
+        elapsed = time.perf_counter() - started
+
+    except Exception:
+        return
+
+    payload_stats.append(
+        {
+            "Table": name,
+            "Rows": len(df),
+            "KB": size / 1024,
+            "ms": elapsed * 1000,
+        }
+    )
+
+
+def totals_frame(df, label_col, totals):
+    # One-row Total payload with the body's columns; numbers stay numeric
+    row = pd.DataFrame([totals]).reindex(columns=df.columns)
+    row[label_col] = "Total"
+
+    for col in df.columns:
+        if col != label_col and col not in totals.index:
+            row[col] = ""
+
+    return row
+
+
+def show_table(name, df, totals=None, column_config=None, **kwargs):
+    column_config = column_config or {}
+
+    st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config,
+        **kwargs,
+    )
+
+    if totals is not None:
+        # blank / label cells are text here, so their body config (e.g. a
+        # DateColumn) must not apply
+        total_config = {
+            col: st.column_config.TextColumn()
+            for col in totals.columns
+            if not pd.api.types.is_numeric_dtype(totals[col])
+        }
+
+        st.dataframe(
+            totals,
+            use_container_width=True,
+            hide_index=True,
+            column_config={**column_config, **total_config},
+        )
+
+    if MEASURE_PAYLOADS:
+        record_payload(name, df)
+
+        if totals is not None:
+            record_payload(f"{name} (total)", totals)
+
+
+# ================================================================
+# HELPER: chunked table exports
+# ================================================================
+EXPORT_CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": (
+        "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+}
+
+
+def iter_export_chunks(df, mask=None, columns=None):
+    # Row slices of the source frame, filtered per slice, so an export never
+    # materialises a second full copy of the (cached) data.
+    cols = list(columns) if columns is not None else list(df.columns)
+
+    if len(df) == 0:
+        yield df[cols]
+        return
+
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        if mask is not None:
+            chunk = chunk[np.asarray(mask)[start:start + EXPORT_CHUNK_ROWS]]
+        yield chunk[cols]
+
+
+def write_csv_chunks(chunks, out):
+    for i, chunk in enumerate(chunks):
+        out.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+
+
+def write_parquet_chunks(chunks, out):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+
+    for chunk in chunks:
+        if writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            # all-null object columns in the first slice have no type yet
+            schema = pa.schema(
+                [
+                    f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                    for f in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            writer = pq.ParquetWriter(out, schema)
+            table = table.cast(schema)
+        else:
+            table = pa.Table.from_pandas(
+                chunk, schema=writer.schema, preserve_index=False
+            )
+        writer.write_table(table)
+
+    writer.close()
+
+
+def write_xlsx_chunks(chunks, out):
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(
+        out,
+        {
+            "constant_memory": True,
+            "nan_inf_to_errors": True,
+            "default_date_format": "yyyy-mm-dd",
+            "remove_timezone": True,
+        },
+    )
+    ws = wb.add_worksheet()
+    row_num = 0
+
+    for chunk in chunks:
+        if row_num == 0:
+            ws.write_row(0, 0, [str(c) for c in chunk.columns])
+            row_num = 1
+
+        values = chunk.astype(object).where(chunk.notna(), None)
+
+        for row in values.itertuples(index=False, name=None):
+            ws.write_row(
+                row_num,
+                0,
+                [str(v) if isinstance(v, timedelta) else v for v in row],
+            )
+            row_num += 1
+
+    wb.close()
+
+
+EXPORT_WRITERS = {
+    "CSV": write_csv_chunks,
+    "Parquet": write_parquet_chunks,
+    "XLSX": write_xlsx_chunks,
+}
+
+
+def make_export(fmt, chunks_fn):
+    # Deferred download body: runs on Streamlit's download thread when the
+    # button is clicked, spooling chunks to a temp file rather than
+    # building the whole payload on the page script.
+    def build():
+        with tempfile.NamedTemporaryFile(
+            suffix="." + EXPORT_FORMATS[fmt][0], delete=False
+        ) as tmp:
+            path = tmp.name
+
+        try:
+            if fmt == "XLSX":
+                EXPORT_WRITERS[fmt](chunks_fn(), path)
+            else:
+                with open(path, "wb") as out:
+                    EXPORT_WRITERS[fmt](chunks_fn(), out)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(path)
+
+    return build
+
+
+def export_buttons(name, chunks_fn, key):
+    cols = st.columns(len(EXPORT_FORMATS) + 3)
+
+    for col, (fmt, (ext, mime)) in zip(cols, EXPORT_FORMATS.items()):
+        with col:
+            st.download_button(
+                f"Export {fmt}",
+                data=make_export(fmt, chunks_fn),
+                file_name=f"{name}_{datetime.date.today():%Y%m%d}.{ext}",
+                mime=mime,
+                on_click="ignore",
+                key=f"{key}_{ext}",
+                use_container_width=True,
+            )
+
+# ================================================================
+# SECTION 1 : MONTHLY ACTIVATION SUMMARY
+# ================================================================
+# static, partner-supplied monthly figures; partners without them skip it
+monthly_summary = partner_cfg.get("monthly_summary")
+
+if monthly_summary:
+    with st.expander("Monthly Activation Summary", expanded=True):
+
+        df_summary = pd.DataFrame(monthly_summary)
+        df_summary["Activated %"] = round(
+            (df_summary["Activated"] / df_summary["Sourced"]) * 100, 2
+        )
+
+        col1, col2 = st.columns([1.3, 1.5])
+
+        with col1:
+
+            show_table(
+                "monthly_summary",
+                df_summary,
+                height=230,
+                column_config={
+                    "Sourced": st.column_config.NumberColumn(format="localized"),
+                    "Activated": st.column_config.NumberColumn(
+                        format="localized"
+                    ),
+                    "Activated %": st.column_config.NumberColumn(
+                        format="%.2f%%"
+                    ),
+                },
+            )
+
+        with col2:
+
+            fig = go.Figure()
+
+            fig.add_trace(
+                go.Bar(
+                    x=df_summary["Month"],
+                    y=df_summary["Sourced"],
+                    name="Sourced",
+                    marker_color=C_NAVY,
+                    marker_line_width=0,
+                    text=df_summary["Sourced"].apply(lambda x: f"{x:,.0f}"),
+                    textposition="outside",
+                    textfont=dict(size=10, color=C_NAVY),
+                )
+            )
+
+            fig.add_trace(
+                go.Bar(
+                    x=df_summary["Month"],
+                    y=df_summary["Activated"],
+                    name="Activated",
+                    marker_color=C_BLUE,
+                    marker_line_width=0,
+                    text=df_summary["Activated"].apply(lambda x: f"{x:,.0f}"),
+                    textposition="outside",
+                    textfont=dict(size=10, color=C_BLUE),
+                )
+            )
+
+            fig.add_trace(
+                go.Scatter(
+                    x=df_summary["Month"],
+                    y=df_summary["Activated %"],
+                    name="Activation %",
+                    mode="lines+markers+text",
+                    yaxis="y2",
+                    line=dict(color=C_SKY, width=2.5),
+                    marker=dict(size=7, color=C_SKY),
+                    text=df_summary["Activated %"].apply(lambda x: f"{x}%"),
+                    textposition="top center",
+                    textfont=dict(size=10, color=C_SKY),
+                )
+            )
+
+            fig.update_layout(
+                barmode="group",
+                height=300,
+                yaxis=dict(
+                    title="Volume",
+                    title_font=dict(size=11),
+                    tickfont=dict(size=10),
+                    gridcolor="#F0F0F0",
+                ),
+                yaxis2=dict(
+                    title="Activation %",
+                    overlaying="y",
+                    side="right",
+                    range=[80, 100],
+                    ticksuffix="%",
+                    title_font=dict(size=11),
+                    tickfont=dict(size=10),
+                ),
+                **CHART_LAYOUT,
+            )
+
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.caption(f"*Data Source: {partner_cfg['source']}*")
+
+# ================================================================
+# HELPER: LTTB downsampling
+# ================================================================
+# Trend charts send at most TREND_POINT_BUDGET points per series for the
+# visible window (about one per horizontal pixel of a full-width chart);
+# narrowing the window re-samples from the full-resolution series.
+TREND_POINT_BUDGET = int(os.getenv("IBL_TREND_POINT_BUDGET", "1000"))
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # per bucket, the point forming the largest triangle with the previous
+    # pick and the next bucket's mean. x must be sorted and numeric.
+    n = len(x)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+
+    a = 0
+
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+
+        if i + 2 < len(edges):
+            nx = x[hi:edges[i + 2]].mean()
+            ny = y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[n - 1], y[n - 1]
+
+        area = np.abs(
+            (x[a] - nx) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (ny - y[a])
+        )
+
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+
+    return picked
+
+
+def downsample_series(dates, values, threshold=TREND_POINT_BUDGET):
+    values = np.asarray(values, dtype="float64")
+    keep = ~np.isnan(values)
+
+    dates, values = dates[keep], values[keep]
+
+    x = dates.astype("datetime64[D]").astype("float64")
+    idx = lttb(x, values, threshold)
+
+    return dates[idx], values[idx]
+
+
+# per partner: 3 views x (current + refreshing) version
+@st.cache_data(show_spinner=False, max_entries=6 * len(PARTNERS))
+def daily_trend(_df, version, view):
+    # Sourced vs activated per account-opening date, all products
+    flag = ACTIVATION_VIEWS[view][0]
+
+    daily = (
+        _df.assign(
+            _day=pd.to_datetime(_df["AccountOpeningDate"]),
+            _act=_df[flag].where(_df[flag] >= 1, 0),
+        )
+        .groupby("_day")
+        .agg(Sourced=("Total_CUID", "sum"), Activated=("_act", "sum"))
+        .sort_index()
+    )
+
+    daily["Activation %"] = (
+        daily["Activated"] / daily["Sourced"].replace(0, np.nan) * 100
+    )
+
+    return daily
+
+
+# ================================================================
+# SECTION 1A : DAY-WISE TREND
+# ================================================================
+ext_snap = get_table(partner, "external")
+df_external = ext_snap["df"]
+
+stale_data_warning(ext_snap)
+
+with st.expander("Day-wise Trend", expanded=True):
+
+    t1, t2 = st.columns([1.6, 2.4])
+
+    with t1:
+
+        st.markdown(
+            '<div class="filter-label">Activation View</div>',
+            unsafe_allow_html=True,
+        )
+
+        trend_view = st.pills(
+            "trend_view",
+            list(ACTIVATION_VIEWS),
+            default="Overall Activated",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="trend_view_pills",
+        ) or "Overall Activated"
+
+    df_trend = daily_trend(df_external, ext_snap["version"], trend_view)
+
+    trend_window = None
+
+    with t2:
+
+        if len(df_trend) > 1:
+
+            st.markdown(
+                '<div class="filter-label">Window</div>',
+                unsafe_allow_html=True,
+            )
+
+            first_day = df_trend.index[0].date()
+            last_day = df_trend.index[-1].date()
+
+            trend_window = st.slider(
+                "trend_window",
+                min_value=first_day,
+                max_value=last_day,
+                value=(first_day, last_day),
+                format="DD MMM YY",
+                label_visibility="collapsed",
+                key="trend_window_slider",
+            )
+
+    if trend_window is not None:
+        df_trend = df_trend.loc[
+            pd.Timestamp(trend_window[0]):pd.Timestamp(trend_window[1])
+        ]
+
+    trend_dates = df_trend.index.to_numpy()
+
+    fig_t = go.Figure()
+
+    for col, color, axis in [
+        ("Sourced", C_NAVY, "y"),
+        ("Activated", C_BLUE, "y"),
+        ("Activation %", C_SKY, "y2"),
+    ]:
+        xs, ys = downsample_series(trend_dates, df_trend[col].to_numpy())
+
+        fig_t.add_trace(
+            go.Scattergl(
+                x=xs,
+                y=ys,
+                name=col,
+                mode="lines",
+                yaxis=axis,
+                line=dict(color=color, width=1.8),
+                hovertemplate=(
+                    "%{x|%d %b %Y}<br>%{y:.2f}%<extra>Activation %</extra>"
+                    if axis == "y2"
+                    else "%{x|%d %b %Y}<br>%{y:,.0f}<extra>" + col + "</extra>"
+                ),
+            )
+        )
+
+    fig_t.update_layout(
+        height=320,
+        hovermode="x unified",
+        yaxis=dict(
+            title="Volume",
+            title_font=dict(size=11),
+            tickfont=dict(size=10),
+            gridcolor="#F0F0F0",
+        ),
+        yaxis2=dict(
+            title="Activation %",
+            overlaying="y",
+            side="right",
+            ticksuffix="%",
+            title_font=dict(size=11),
+            tickfont=dict(size=10),
+        ),
+        **CHART_LAYOUT,
+    )
+
+    st.plotly_chart(fig_t, use_container_width=True)
+
+    st.caption(
+        f"*{len(df_trend):,} days in window, up to {TREND_POINT_BUDGET:,} "
+        "points per series (LTTB). Data Source: Creditas DataBase*"
+    )
+
+
+# ================================================================
+# SECTION 1B : ACTIVATION ANOMALIES
+# ================================================================
+anomalies = list(reversed(anomaly_state(partner)["anomalies"]))
+
+with st.expander(
+    f"Activation Anomalies ({len(anomalies)})",
+    expanded=bool(anomalies),
+):
+
+    if not anomalies:
+        st.caption("No anomalous days flagged.")
+
+    else:
+        df_anom = pd.DataFrame(anomalies)
+        df_anom["date"] = pd.to_datetime(df_anom["date"])
+
+        latest_flag = df_anom["date"].max()
+        recent_drops = df_anom[
+            (df_anom["direction"] == "drop")
+            & (df_anom["date"] >= latest_flag - pd.Timedelta(days=6))
+        ]
+
+        if len(recent_drops):
+            st.warning(
+                f"{len(recent_drops)} activation-rate drop(s) in the week to "
+                f"{latest_flag:%d %b %Y}: "
+                + ", ".join(
+                    sorted(
+                        set(recent_drops["product"] + " / " + recent_drops["view"])
+                    )
+                )
+            )
+
+        only_drops = st.toggle("Drops only", value=True, key="anomaly_drops_only")
+
+        if only_drops:
+            df_anom = df_anom[df_anom["direction"] == "drop"]
+
+        show_table(
+            "anomalies",
+            df_anom.rename(
+                columns={
+                    "date": "Received Date",
+                    "product": "Product",
+                    "view": "Activation View",
+                    "direction": "Direction",
+                    "rate": f"Day{ANOMALY_HORIZON_DAYS} Rate %",
+                    "expected": "Expected %",
+                    "z": "Z",
+                    "activated": "Activated",
+                    "sourced": "Sourced",
+                }
+            ),
+            column_config={
+                "Received Date": st.column_config.DateColumn(
+                    format="DD MMM YYYY"
+                ),
+                f"Day{ANOMALY_HORIZON_DAYS} Rate %": st.column_config.NumberColumn(
+                    format="%.2f%%"
+                ),
+                "Expected %": st.column_config.NumberColumn(format="%.2f%%"),
+            },
+        )
+
+    st.caption(
+        f"*Day{ANOMALY_HORIZON_DAYS} activation rate by Received Date vs its "
+        f"EWMA + weekday baseline, flagged at |z| ≥ {ANOMALY_Z:g}. "
+        f"Alerts are also appended to {os.path.relpath(ALERT_LOG)}.*"
+    )
+
+
+# ================================================================
+# HELPER: sorted date index
+# ================================================================
+# Range filters slice a copy of the snapshot kept sorted by the date column,
+# located with searchsorted over integer day codes instead of a row scan.
+RANGE_WINDOWS = {
+    "Last 7 days": 7,
+    "Last 14 days": 14,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Custom": None,
+}
+
+
+# per partner: 2 date columns x (current + refreshing) version
+@st.cache_resource(show_spinner=False, max_entries=4 * len(PARTNERS))
+def sorted_date_index(_df, version, col):
+    # (frame sorted by col, matching int64 day codes); NaT rows dropped
+    days = pd.to_datetime(_df[col]).to_numpy().astype("datetime64[D]")
+    valid = ~np.isnat(days)
+    codes = days[valid].astype(np.int64)
+    order = np.argsort(codes, kind="stable")
+
+    frame = _df[valid].iloc[order].reset_index(drop=True)
+
+    return frame, codes[order]
+
+
+def day_code(d):
+    return np.datetime64(d, "D").astype(np.int64)
+
+
+def date_range_slice(df, version, col, start, end):
+    frame, codes = sorted_date_index(df, version, col)
+
+    lo = np.searchsorted(codes, day_code(start), side="left")
+    hi = np.searchsorted(codes, day_code(end), side="right")
+
+    return frame.iloc[lo:hi]
+
+
+def date_range_picker(df, version, col, key):
+    _, codes = sorted_date_index(df, version, col)
+
+    if len(codes) == 0:
+        today = datetime.date.today()
+        return today, today
+
+    first = codes[0].astype("datetime64[D]").item()
+    last = codes[-1].astype("datetime64[D]").item()
+
+    window = st.pills(
+        f"{key}_window",
+        list(RANGE_WINDOWS),
+        default="Last 30 days",
+        selection_mode="single",
+        label_visibility="collapsed",
+        key=f"{key}_window_pills",
+    )
+
+    days = RANGE_WINDOWS.get(window)
+
+    # a slider needs min < max; a single data date is shown as a caption
+    if days is None and first < last:
+        return st.slider(
+            "Date Range",
+            min_value=first,
+            max_value=last,
+            value=(max(first, last - timedelta(days=29)), last),
+            format="DD MMM YY",
+            label_visibility="collapsed",
+            key=f"{key}_slider",
+        )
+
+    if days is None:
+        start = first
+    else:
+        start = max(first, last - timedelta(days=days - 1))
+
+    st.caption(f"{start:%d %b %Y} – {last:%d %b %Y} (latest data date)")
+
+    return start, last
+
+
+# ================================================================
+# SECTION 2 : DAY-WISE ACTIVATION SUMMARY
+# ================================================================
+with st.expander("Day-wise Activation Summary", expanded=True):
+
+    fa, fb = st.columns([0.8, 3.2])
+
+    c1, c2, c3 = st.columns([2, 3, 2])
+
+    # Date View is read first: a date-range filter slices on its column
+    with c1:
+
+        st.markdown(
+            '<div class="filter-label">Date View</div>',
+            unsafe_allow_html=True,
+        )
+
+        date_view = st.pills(
+            "date_view",
+            ["Account Opening Date", "Received Date"],
+            default="Account Opening Date",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="date_view_pills",
+        )
+
+    range_col = (
+        "ReceivedDate" if date_view == "Received Date" else "AccountOpeningDate"
+    )
+
+    with fa:
+
+        desc_options = ["All"] + sorted(
+            df_external["ProductDesc"].dropna().unique().tolist()
+        )
+
+        product_filter = st.selectbox(
+            "Product",
+            options=desc_options,
+            index=0,
+            key="product_select",
+        )
+
+        period_mode = st.radio(
+            "Period",
+            ["Month Year", "Date Range"],
+            horizontal=True,
+            key="period_mode",
+        )
+
+    with fb:
+
+        month_filter = []
+
+        if period_mode == "Date Range":
+
+            st.markdown(
+                '<div class="filter-label">Date Range</div>',
+                unsafe_allow_html=True,
+            )
+
+            range_start, range_end = date_range_picker(
+                df_external, ext_snap["version"], range_col, key="daywise"
+            )
+
+        else:
+
+            st.markdown(
+                '<div class="filter-label">Month Year</div>',
+                unsafe_allow_html=True,
+            )
+
+            month_label_map = dict(
+                zip(df_external["MonthYearLabel"], df_external["MonthYear"])
+            )
+
+            month_num_to_label = {v: k for k, v in month_label_map.items()}
+
+            _my_order = (
+                df_external[["MonthYearLabel", "MonthYear"]]
+                .drop_duplicates()
+                .dropna()
+                .sort_values("MonthYear")
+            )
+
+            month_labels_sorted = _my_order["MonthYearLabel"].tolist()
+
+            latest_month_label = month_num_to_label.get(
+                df_external["MonthYear"].max()
+            )
+
+            month_filter_labels = st.pills(
+                "month_year",
+                options=month_labels_sorted,
+                default=[latest_month_label] if latest_month_label else None,
+                selection_mode="multi",
+                label_visibility="collapsed",
+                key="month_pills",
+            )
+
+            month_filter = (
+                [month_label_map[l] for l in month_filter_labels]
+                if month_filter_labels
+                else []
+            )
+
+    with c2:
+
+        st.markdown(
+            '<div class="filter-label">Activation View</div>',
+            unsafe_allow_html=True,
+        )
+
+        activation_view = st.pills(
+            "activation_view",
+            [
+                "Overall Activated",
+                "Creditas Activated",
+                "Bank Activated",
+            ],
+            default="Overall Activated",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="act_view_pills",
+        )
+
+    with c3:
+
+        st.markdown(
+            '<div class="filter-label">Metric</div>',
+            unsafe_allow_html=True,
+        )
+
+        view_mode = st.pills(
+            "view_mode",
+            ["Count", "Activation %"],
+            default="Count",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="view_mode_pills",
+        )
+
+    if period_mode == "Date Range":
+        df_filtered = date_range_slice(
+            df_external,
+            ext_snap["version"],
+            range_col,
+            range_start,
+            range_end,
+        )
+    else:
+        df_filtered = df_external
+
+    if product_filter != "All":
+        df_filtered = df_filtered[
+            df_filtered["ProductDesc"] == product_filter
+        ]
+
+    if month_filter:
+        df_filtered = df_filtered[
+            df_filtered["MonthYear"].isin(month_filter)
+        ]
+
+    if activation_view == "Creditas Activated":
+        df_act = df_filtered[
+            df_filtered["CreditasActivated"] >= 1
+        ].copy()
+
+    elif activation_view == "Bank Activated":
+        df_act = df_filtered[
+            df_filtered["BankActivated"] >= 1
+        ].copy()
+
+    else:
+        df_act = df_filtered[
+            df_filtered["OverallActivated"] >= 1
+        ].copy()
+
+    if date_view == "Received Date":
+
+        date_col = "ReceivedDate"
+
+        if activation_view == "Creditas Activated":
+            act_date_col = "ActivationDate"
+
+        elif activation_view == "Bank Activated":
+            act_date_col = "BankActivatedDate"
+
+        else:
+            act_date_col = "OverallActivatedDate"
+
+        df_rd = df_act.copy()
+
+        df_rd["_rcd_dt"] = pd.to_datetime(df_rd["ReceivedDate"])
+        df_rd["_act_dt"] = pd.to_datetime(
+            df_rd[act_date_col],
+            errors="coerce",
+        )
+
+        df_rd["_day_rd"] = (
+            (df_rd["_act_dt"] - df_rd["_rcd_dt"])
+            .dt.days.clip(lower=0)
+            .fillna(0)
+            .astype(int)
+        )
+
+        if len(df_rd) > 0:
 
             df_pivot = (
                 df_rd.groupby(["ReceivedDate", "_day_rd"])["Total_Activation"]
@@ -618,285 +2167,1587 @@ with st.expander("Day-wise Activation Summary", expanded=True):
                 .fillna(0)
             )
 
-            df_pivot.columns = [f"Day{int(c)}" for c in df_pivot.columns]
+            df_pivot.columns = [f"Day{int(c)}" for c in df_pivot.columns]
+
+            df_pivot = df_pivot.reset_index()
+
+        else:
+
+            df_pivot = pd.DataFrame(columns=["ReceivedDate"])
+
+        df_cuid_base = df_filtered.groupby(
+            "ReceivedDate",
+            as_index=False,
+        )["Total_CUID"].sum()
+
+        df_grouped = (
+            df_pivot.merge(
+                df_cuid_base,
+                on="ReceivedDate",
+                how="left",
+            )
+            .sort_values("ReceivedDate")
+        )
+
+        act_grp = df_act.groupby(
+            "ReceivedDate",
+            as_index=False,
+        )["Total_Activation"].sum()
+
+        df_grouped = df_grouped.merge(
+            act_grp,
+            on="ReceivedDate",
+            how="left",
+        )
+
+    else:
+
+        date_col = "AccountOpeningDate"
+
+        df_cuid_base = df_filtered.groupby(
+            date_col,
+            as_index=False,
+        )["Total_CUID"].sum()
+
+        numeric_cols = df_act.select_dtypes(include="number").columns
+
+        df_grouped = (
+            df_act.groupby(date_col, as_index=False)[numeric_cols]
+            .sum()
+            .sort_values(date_col)
+        )
+
+        df_grouped = (
+            df_grouped.drop(columns=["Total_CUID"], errors="ignore")
+            .merge(df_cuid_base, on=date_col, how="left")
+        )
+
+    cols_remove = [
+        "CreditasActivated",
+        "BankActivated",
+        "OverallActivated",
+        "MonthYear",
+        "MonthYearLabel",
+        "ProductCode",
+        "ProductDesc",
+        "ReceivedDate",
+        "ActivationDate",
+        "BankActivatedDate",
+        "OverallActivatedDate",
+        "AccountOpeningDate",
+    ]
+
+    cols_remove = [c for c in cols_remove if c != date_col]
+
+    df_display = df_grouped.drop(columns=cols_remove, errors="ignore")
+
+    priority = [date_col, "Total_CUID"]
+
+    df_display = df_display[
+        priority + [c for c in df_display.columns if c not in priority]
+    ]
+
+    day_columns = [c for c in df_display.columns if c.startswith("Day")]
+
+    metric_cols = df_display.select_dtypes(include="number").columns
+
+    df_view = df_display.head(100).copy()
+
+    raw_totals = df_view[metric_cols].sum()
+    total_row = raw_totals.astype("float64")
+
+    if view_mode == "Activation %":
+
+        df_view[day_columns] = (
+            df_view[day_columns].div(
+                df_view["Total_Activation"].replace(0, 1), axis=0
+            )
+            * 100
+        ).round(2)
+
+        denom = raw_totals.get("Total_Activation", 1) or 1
+
+        total_row[day_columns] = (raw_totals[day_columns] / denom * 100).round(2)
+
+        day_format = "%.2f%%"
+
+    else:
+
+        day_format = "localized"
+
+    df_view[date_col] = pd.to_datetime(df_view[date_col])
+
+    show_table(
+        "daywise_activation",
+        df_view,
+        totals=totals_frame(df_view, date_col, total_row),
+        column_config={
+            date_col: st.column_config.DateColumn(format="DD MMM YYYY"),
+            **{
+                c: st.column_config.NumberColumn(format="localized")
+                for c in metric_cols
+            },
+            **{
+                c: st.column_config.NumberColumn(format=day_format)
+                for c in day_columns
+            },
+        },
+    )
+
+    export_buttons(
+        "daywise_activation",
+        lambda df=df_display: iter_export_chunks(df),
+        key="export_daywise",
+    )
+
+    st.caption("*Data Source: Creditas DataBase*")
+
+# ================================================================
+# COHORT ACTIVATION CURVES
+# ================================================================
+# Per account-opening month: lag histograms (activation date - opening date)
+# by view / product / opening date, turned into cumulative curves with
+# prefix sums. Histograms are kept per month and reused across data
+# versions when that month's rows are unchanged, so a refresh only rebuilds
+# the months that received new or restated rows.
+COHORT_MAX_DAY = 60
+
+COHORT_TABLE_DAYS = [0, 1, 3, 7, 14, 30, 60]
+
+COHORT_FP_COLS = [
+    "AccountOpeningDate",
+    "ProductDesc",
+    "Total_CUID",
+    "CreditasActivated",
+    "BankActivated",
+    "OverallActivated",
+    "ActivationDate",
+    "BankActivatedDate",
+    "OverallActivatedDate",
+]
+
+
+def _month_histogram(dfm):
+    aod = pd.to_datetime(dfm["AccountOpeningDate"])
+    parts = []
+
+    for view, (flag, act_col) in ACTIVATION_VIEWS.items():
+        lag = (
+            (pd.to_datetime(dfm[act_col], errors="coerce") - aod)
+            .dt.days.clip(lower=0)
+            .fillna(0)
+            .astype(int)
+        )
+
+        part = pd.DataFrame(
+            {
+                "ProductDesc": dfm["ProductDesc"].to_numpy(),
+                "AOD": aod.to_numpy(),
+                "Lag": lag.to_numpy(),
+                "Count": dfm[flag].where(dfm[flag] >= 1, 0).to_numpy(),
+            }
+        )
+
+        part = (
+            part[(part["Count"] > 0) & (part["Lag"] <= COHORT_MAX_DAY)]
+            .groupby(["ProductDesc", "AOD", "Lag"], as_index=False)["Count"]
+            .sum()
+        )
+        part.insert(0, "View", view)
+        parts.append(part)
+
+    cuid = (
+        dfm.assign(AOD=aod)
+        .groupby(["ProductDesc", "AOD"], as_index=False)["Total_CUID"]
+        .sum()
+    )
+
+    return {"hist": pd.concat(parts, ignore_index=True), "cuid": cuid}
+
+
+@st.cache_resource(show_spinner=False)
+def cohort_state(partner):
+    return {
+        "version": None,
+        "months": {},
+        "last_day": None,
+        "lock": threading.Lock(),
+    }
+
+
+def cohort_histograms(partner, df, version):
+    state = cohort_state(partner)
+
+    with state["lock"]:
+        if state["version"] == version:
+            return state["months"], state["last_day"]
+
+        cols = [c for c in COHORT_FP_COLS if c in df.columns]
+        row_hash = pd.util.hash_pandas_object(df[cols], index=False)
+        fingerprints = row_hash.groupby(df["MonthYear"].to_numpy()).sum()
+        groups = df.groupby("MonthYear").indices
+
+        months = {}
+
+        for month, fp in fingerprints.items():
+            prev = state["months"].get(month)
+
+            if prev is not None and prev["fp"] == fp:
+                months[month] = prev
+            else:
+                months[month] = {
+                    "fp": fp,
+                    **_month_histogram(df.iloc[groups[month]]),
+                }
+
+        # curves are only defined up to the last day the data can show
+        last_day = pd.to_datetime(
+            pd.concat(
+                [df["AccountOpeningDate"]]
+                + [df[c] for _, c in ACTIVATION_VIEWS.values()],
+                ignore_index=True,
+            ),
+            errors="coerce",
+        ).max()
+
+        state.update(months=months, version=version, last_day=last_day)
+
+        return months, last_day
+
+
+@st.cache_data(show_spinner=False, max_entries=32 * len(PARTNERS))
+def cohort_curves(partner, _df, version, view, product):
+    # Cumulative % activated by day N per opening month. For day N only
+    # accounts opened at least N days before the last data date count, in
+    # both numerator and denominator, so young cohorts are not understated.
+    months, last_day = cohort_histograms(partner, _df, version)
+
+    days = np.arange(COHORT_MAX_DAY + 1)
+    last = np.datetime64(last_day, "D")
+    curves = {}
+
+    for month in sorted(months):
+        hist = months[month]["hist"]
+        cuid = months[month]["cuid"]
+
+        hist = hist[hist["View"] == view]
+
+        if product != "All":
+            hist = hist[hist["ProductDesc"] == product]
+            cuid = cuid[cuid["ProductDesc"] == product]
+
+        cuid = cuid.groupby("AOD")["Total_CUID"].sum()
+
+        if cuid.empty:
+            continue
+
+        aod_days = cuid.index.to_numpy().astype("datetime64[D]")
+        aod_idx = np.searchsorted(
+            aod_days, hist["AOD"].to_numpy().astype("datetime64[D]")
+        )
+
+        counts = np.zeros((len(aod_days), len(days)))
+        np.add.at(
+            counts,
+            (aod_idx, hist["Lag"].to_numpy()),
+            hist["Count"].to_numpy(dtype="float64"),
+        )
+
+        cum = counts.cumsum(axis=1)
+        eligible = (aod_days[:, None] + days[None, :]) <= last
+
+        num = (cum * eligible).sum(axis=0)
+        den = (cuid.to_numpy(dtype="float64")[:, None] * eligible).sum(axis=0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            curves[fmt_month(month)] = np.where(den > 0, num / den * 100, np.nan)
+
+    out = pd.DataFrame(curves, index=pd.Index(days, name="Day"))
+
+    return out.round(2)
+
+
+# ================================================================
+# SECTION 2A : ACTIVATION VELOCITY BY COHORT
+# ================================================================
+with st.expander("Activation Velocity by Cohort", expanded=True):
+
+    v1, v2, v3 = st.columns([0.8, 1.6, 2.4])
+
+    with v1:
+
+        cohort_product = st.selectbox(
+            "Product",
+            options=["All"]
+            + sorted(df_external["ProductDesc"].dropna().unique().tolist()),
+            index=0,
+            key="cohort_product_select",
+        )
+
+    with v2:
+
+        st.markdown(
+            '<div class="filter-label">Activation View</div>',
+            unsafe_allow_html=True,
+        )
+
+        cohort_view = st.pills(
+            "cohort_view",
+            list(ACTIVATION_VIEWS),
+            default="Overall Activated",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="cohort_view_pills",
+        ) or "Overall Activated"
+
+    df_curves = cohort_curves(
+        partner,
+        df_external,
+        ext_snap["version"],
+        cohort_view,
+        cohort_product,
+    )
+
+    with v3:
+
+        st.markdown(
+            '<div class="filter-label">Cohort Month</div>',
+            unsafe_allow_html=True,
+        )
+
+        cohort_months = st.pills(
+            "cohort_months",
+            df_curves.columns.tolist(),
+            default=df_curves.columns.tolist()[-6:],
+            selection_mode="multi",
+            label_visibility="collapsed",
+            key="cohort_month_pills",
+        ) or df_curves.columns.tolist()
+
+    cohort_months = [m for m in df_curves.columns if m in cohort_months]
+
+    cv1, cv2 = st.columns([1.6, 1.2])
+
+    with cv1:
+
+        cohort_colors = [C_NAVY, C_BLUE, C_SKY, C_GREEN, C_AMBER, C_RED, C_MUTED]
+
+        fig_c = go.Figure()
+
+        for i, month in enumerate(cohort_months):
+            fig_c.add_trace(
+                go.Scatter(
+                    x=df_curves.index,
+                    y=df_curves[month],
+                    name=month,
+                    mode="lines",
+                    line=dict(color=cohort_colors[i % len(cohort_colors)], width=2),
+                )
+            )
+
+        fig_c.update_layout(
+            height=320,
+            xaxis=dict(title="Days since account opening", tickfont=dict(size=10)),
+            yaxis=dict(
+                title="Cumulative Activated %",
+                ticksuffix="%",
+                tickfont=dict(size=10),
+                gridcolor="#F0F0F0",
+            ),
+            **CHART_LAYOUT,
+        )
+
+        st.plotly_chart(fig_c, use_container_width=True)
+
+    with cv2:
+
+        cohort_table = (
+            df_curves.loc[COHORT_TABLE_DAYS, cohort_months]
+            .T.rename(columns=lambda d: f"Day{d}")
+            .rename_axis(index="Cohort", columns=None)
+            .reset_index()
+        )
+
+        show_table(
+            "cohort_curves",
+            cohort_table,
+            column_config={
+                f"Day{d}": st.column_config.NumberColumn(format="%.2f%%")
+                for d in COHORT_TABLE_DAYS
+            },
+        )
+
+    st.caption(
+        "*Day N counts only accounts opened at least N days before the latest "
+        "data date. Data Source: Creditas DataBase*"
+    )
+
+# ================================================================
+# SECTION 2B : WHAT CHANGED (SNAPSHOT DIFF)
+# ================================================================
+snapshot_days = list_snapshots(partner)
+
+with st.expander("What Changed Since Last Snapshot", expanded=False):
+
+    if len(snapshot_days) < 2:
+        st.caption(
+            "A daily snapshot is saved on each data refresh; the diff becomes "
+            "available once two days have been captured."
+        )
+
+    else:
+        day_label = {
+            d: datetime.datetime.strptime(d, "%Y%m%d").strftime("%d %b %Y")
+            for d in snapshot_days
+        }
+
+        s1, s2, s3 = st.columns([1, 1, 2])
+
+        with s1:
+            base_day = st.selectbox(
+                "Base snapshot",
+                snapshot_days,
+                index=len(snapshot_days) - 2,
+                format_func=day_label.get,
+                key="snapshot_base",
+            )
+
+        with s2:
+            compare_day = st.selectbox(
+                "Compare snapshot",
+                snapshot_days,
+                index=len(snapshot_days) - 1,
+                format_func=day_label.get,
+                key="snapshot_compare",
+            )
+
+        with s3:
+            st.markdown(
+                '<div class="filter-label">Date View</div>',
+                unsafe_allow_html=True,
+            )
+
+            diff_view = st.pills(
+                "diff_date_view",
+                ["Account Opening Date", "Received Date"],
+                default="Account Opening Date",
+                selection_mode="single",
+                label_visibility="collapsed",
+                key="diff_date_view_pills",
+            )
+
+        diff_col = (
+            "ReceivedDate" if diff_view == "Received Date" else "AccountOpeningDate"
+        )
+
+        df_diff = diff_snapshots(
+            partner,
+            base_day,
+            compare_day,
+            diff_col,
+            (
+                snapshot_mtime(partner, base_day),
+                snapshot_mtime(partner, compare_day),
+            ),
+        )
+
+        m1, m2, m3, m4 = st.columns(4)
+
+        for col, metric, label in [
+            (m1, "OverallActivated", "Overall Activated"),
+            (m2, "CreditasActivated", "Creditas Activated"),
+            (m3, "BankActivated", "Bank Activated"),
+            (m4, "Total_CUID", "Total CUID"),
+        ]:
+            with col:
+                st.metric(
+                    f"Δ {label}",
+                    f"{df_diff[f'Δ {metric}'].sum():+,.0f}",
+                )
+
+        show_table(
+            "snapshot_diff",
+            df_diff,
+            column_config={
+                c: st.column_config.NumberColumn(format="%+d")
+                for c in df_diff.columns
+                if c.startswith("Δ ")
+            },
+        )
+
+        st.caption(
+            f"*{len(df_diff):,} date/product rows changed between "
+            f"{day_label[base_day]} and {day_label[compare_day]}.*"
+        )
+
+# ================================================================
+# SECTION 3 : CAMPAIGN SUMMARY
+# ================================================================
+camp_snap = get_table(partner, "campaigns")
+df_camp = camp_snap["df"]
+
+stale_data_warning(camp_snap)
+
+cm_map = dict(zip(df_camp["_MonthLabel"], df_camp["_MonthNum"]))
+cm_rev = {v: k for k, v in cm_map.items()}
+
+_cm_order = (
+    df_camp[["_MonthLabel", "_MonthNum"]]
+    .drop_duplicates()
+    .dropna()
+    .sort_values("_MonthNum")
+)
+
+cm_sorted = _cm_order["_MonthLabel"].tolist()
+cm_latest = cm_rev.get(df_camp["_MonthNum"].max())
+
+
+# ================================================================
+# CAMPAIGN FUNNEL ENGINE
+# ================================================================
+# Linear funnel stages; a stage made of several columns is their sum.
+# ConsentCTA / ConsentOTP is an optional branch between login and PIN set
+# (zero for most campaigns), so it is reported beside the funnel, not in it.
+# Only same-day activations follow Set PIN: Card_Activated_DiffDay can land
+# in a later run without a PIN set in this one, so it is a branch as well.
+FUNNEL_STAGES = [
+    ("Sent", ["Sent"]),
+    ("Delivered", ["IsDelivered"]),
+    ("Landed", ["Landed"]),
+    ("Login", ["Login_Last_4_CC"]),
+    ("OTP Verified", ["Login_OTP"]),
+    ("Set PIN", ["Set_Pin"]),
+    ("Activated", ["Card_Activated_SameDay"]),
+]
+
+FUNNEL_BRANCHES = [
+    ("Activated Later", ["Card_Activated_DiffDay"]),
+    ("Consent CTA", ["ConsentCTA"]),
+    ("Consent OTP", ["ConsentOTP"]),
+]
+
+FUNNEL_DIMENSIONS = ["Channel", "TemplateCategory", "CampaignTitle"]
+
+
+# per partner: current + refreshing version
+@st.cache_data(show_spinner=False, max_entries=2 * len(PARTNERS))
+def build_funnel_cube(_df, version):
+    # Stage totals per (dimension, key, month) for every dimension at once.
+    # Rows are bucketed with integer codes + np.bincount, so cost is linear
+    # in the number of campaign rows and independent of the group count.
+    # _df is not hashed by st.cache_data; the snapshot version is the key.
+    df = _df
+    measures = FUNNEL_STAGES + FUNNEL_BRANCHES
+    names = [m for m, _ in measures]
+
+    stage_matrix = np.column_stack(
+        [
+            df.reindex(columns=cols)
+            .apply(pd.to_numeric, errors="coerce")
+            .fillna(0)
+            .to_numpy(dtype="float64")
+            .sum(axis=1)
+            for _, cols in measures
+        ]
+    )
+
+    month_codes, months = pd.factorize(df["_MonthNum"], sort=True)
+    n_months = len(months)
+
+    frames = []
+
+    for dim in FUNNEL_DIMENSIONS:
+
+        key_codes, keys = pd.factorize(
+            df[dim].fillna("Unknown").astype(str),
+            sort=True,
+        )
+
+        valid = (key_codes >= 0) & (month_codes >= 0)
+        flat = key_codes[valid] * n_months + month_codes[valid]
+        size = len(keys) * n_months
+
+        present = np.bincount(flat, minlength=size) > 0
+
+        sums = {
+            name: np.bincount(
+                flat,
+                weights=stage_matrix[valid, i],
+                minlength=size,
+            )[present]
+            for i, name in enumerate(names)
+        }
+
+        idx = np.flatnonzero(present)
+
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Dimension": dim,
+                    "Key": np.asarray(keys)[idx // n_months],
+                    "_MonthNum": np.asarray(months)[idx % n_months],
+                    **sums,
+                }
+            )
+        )
+
+    return pd.concat(frames, ignore_index=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=16 * len(PARTNERS))
+def funnel_for_months(cube, month_nums):
+    # Collapse the monthly cube over the selected months and derive the
+    # stage-to-stage conversion rates (each stage vs the one before it).
+    sel = cube[cube["_MonthNum"].isin(month_nums)] if month_nums else cube
+
+    names = [m for m, _ in FUNNEL_STAGES + FUNNEL_BRANCHES]
+
+    out = sel.groupby(["Dimension", "Key"], as_index=False, sort=False)[
+        names
+    ].sum()
+
+    for (prev, _), (stage, _) in zip(FUNNEL_STAGES, FUNNEL_STAGES[1:]):
+        out[f"{stage} %"] = (
+            out[stage] / out[prev].replace(0, np.nan) * 100
+        ).round(2)
+
+    out["Consent %"] = (
+        out["Consent OTP"] / out["Consent CTA"].replace(0, np.nan) * 100
+    ).round(2)
+
+    first, last = FUNNEL_STAGES[0][0], FUNNEL_STAGES[-1][0]
+
+    out["End-to-End %"] = (
+        out[last] / out[first].replace(0, np.nan) * 100
+    ).round(2)
+
+    return out
+
+
+# ================================================================
+# CAMPAIGN ROLLUP ENGINE
+# ================================================================
+# Subtotals for every prefix of the hierarchy, i.e. the grouping sets
+# (Channel), (Channel, TemplateCategory), ... down to ScheduleDate, from a
+# single lexsort of the selected rows. In that order each level's groups
+# are contiguous runs: leaf sums are one np.add.reduceat, every coarser
+# level reduces the leaf sums, and a node's children are a [start, end)
+# slice of the next level, so expanding a node is a lookup.
+ROLLUP_LEVELS = ["Channel", "TemplateCategory", "CampaignTitle", "ScheduleDate"]
+
+# Never shown in the campaign table (ids, free text, helper columns)
+CAMPAIGN_HIDDEN_COLUMNS = [
+    "Unnamed: 0",
+    "TemplateContent",
+    "LongUrl",
+    "Category",
+    "_MonthNum",
+    "_MonthLabel",
+    "CampaignId",
+    "TemplateId",
+    "Last_5_Fail",
+    "Last_3_Fail",
+    "Click",
+    "BotClicks",
+    "NotBotClicks",
+]
+
+
+@st.cache_resource(show_spinner=False, max_entries=16 * len(PARTNERS))
+def campaign_rollup(_df, version, month_nums):
+    # Read-only result shared by every session on this version + months
+    df = _df[_df["_MonthNum"].isin(month_nums)] if month_nums else _df
+
+    measures = [
+        c
+        for c in df.select_dtypes(include="number").columns
+        if c not in CAMPAIGN_HIDDEN_COLUMNS
+    ]
+
+    codes, labels = [], []
+
+    for col in ROLLUP_LEVELS:
+        c, u = pd.factorize(df[col], sort=True)
+
+        if col == "ScheduleDate":
+            u = u.strftime("%d-%b-%Y")
+
+        # missing keys (-1) become an "Unknown" node sorted last
+        labels.append(np.append(np.asarray(u, dtype=object), "Unknown"))
+        codes.append(np.where(c < 0, len(u), c))
+
+    order = np.lexsort(codes[::-1])
+    keys = np.column_stack([c[order] for c in codes])
+    values = df[measures].fillna(0).to_numpy(dtype="float64")[order]
+
+    n = len(order)
+    change = np.zeros(n, dtype=bool)
+    change[:1] = True
+
+    starts = []
+
+    for depth in range(len(ROLLUP_LEVELS)):
+        change[1:] |= keys[1:, depth] != keys[:-1, depth]
+        starts.append(np.flatnonzero(change))
+
+    leaf = (
+        np.add.reduceat(values, starts[-1], axis=0)
+        if n
+        else np.zeros((0, len(measures)))
+    )
+
+    levels = []
+
+    for depth, st_d in enumerate(starts):
+        level = {
+            "label": labels[depth][keys[st_d, depth]],
+            "values": (
+                np.add.reduceat(leaf, np.searchsorted(starts[-1], st_d), axis=0)
+                if n
+                else leaf
+            ),
+        }
+
+        if depth + 1 < len(starts):
+            child_start = np.searchsorted(starts[depth + 1], st_d)
+            level["child_start"] = child_start
+            level["child_end"] = np.append(
+                child_start[1:], len(starts[depth + 1])
+            )
+
+        levels.append(level)
+
+    return {"measures": measures, "levels": levels, "total": values.sum(axis=0)}
+
+
+def rollup_view(rollup, expanded):
+    # Visible rows in tree order: every Channel plus the children of each
+    # expanded node (expanded holds label paths, so it survives a change
+    # of months). Only nodes on screen are visited.
+    levels = rollup["levels"]
+    last = len(levels) - 1
+
+    rows = []
+    stack = [(0, i, ()) for i in reversed(range(len(levels[0]["label"])))]
+
+    while stack:
+        depth, i, parent = stack.pop()
+        path = parent + (levels[depth]["label"][i],)
+        is_open = depth < last and path in expanded
+
+        rows.append((depth, i, path, is_open))
+
+        if is_open:
+            lv = levels[depth]
+            stack.extend(
+                (depth + 1, j, path)
+                for j in reversed(range(lv["child_start"][i], lv["child_end"][i]))
+            )
+
+    marker = {True: "▾ ", False: "▸ "}
+
+    view = pd.DataFrame(
+        {
+            "Campaign": [
+                "\u2003" * d + (marker[o] if d < last else "") + str(p[-1])
+                for d, _, p, o in rows
+            ],
+            "Level": [ROLLUP_LEVELS[d] for d, _, _, _ in rows],
+        }
+    )
+
+    values = np.vstack(
+        [levels[d]["values"][i] for d, i, _, _ in rows]
+        or [np.zeros((0, len(rollup["measures"])))]
+    )
+
+    for k, m in enumerate(rollup["measures"]):
+        view[m] = values[:, k]
+
+    return view, [p for _, _, p, _ in rows]
+
+
+def toggle_rollup_node(table_key, paths):
+    rows = st.session_state[table_key].selection.rows
+
+    if rows and rows[0] < len(paths):
+        st.session_state.camp_rollup_expanded ^= {paths[rows[0]]}
+
+    # new table key clears the selection, so the same row can be clicked again
+    st.session_state.camp_rollup_clicks += 1
+
+
+with st.expander("Campaign Summary", expanded=True):
+
+    st.markdown(
+        '<div class="filter-label">Month Year</div>',
+        unsafe_allow_html=True,
+    )
+
+    camp_sel = st.pills(
+        "camp_month",
+        cm_sorted,
+        default=[cm_latest] if cm_latest else None,
+        selection_mode="multi",
+        label_visibility="collapsed",
+        key="camp_month_pills",
+    )
+
+    sel_nums = [cm_map[l] for l in camp_sel] if camp_sel else []
+
+    camp_export_cols = [
+        c for c in df_camp.columns if c not in CAMPAIGN_HIDDEN_COLUMNS
+    ]
+
+    camp_view = st.radio(
+        "View",
+        ["Campaign List", "Drill-down"],
+        horizontal=True,
+        key="camp_view_mode",
+    )
+
+    if camp_view == "Drill-down":
+
+        st.session_state.setdefault("camp_rollup_expanded", set())
+        st.session_state.setdefault("camp_rollup_clicks", 0)
+
+        rollup = campaign_rollup(
+            df_camp, camp_snap["version"], tuple(sorted(sel_nums))
+        )
+
+        df_tree, tree_paths = rollup_view(
+            rollup, st.session_state.camp_rollup_expanded
+        )
+
+        tree_key = f"camp_rollup_{st.session_state.camp_rollup_clicks}"
+
+        st.caption(
+            "Click a row to expand or collapse it: Channel → Template "
+            "Category → Campaign → Schedule Date."
+        )
+
+        show_table(
+            "campaign_rollup",
+            df_tree,
+            totals=totals_frame(
+                df_tree,
+                "Campaign",
+                pd.Series(rollup["total"], index=rollup["measures"]),
+            ),
+            key=tree_key,
+            on_select=lambda k=tree_key, p=tree_paths: toggle_rollup_node(k, p),
+            selection_mode="single-row",
+            column_config={
+                m: st.column_config.NumberColumn(format="localized")
+                for m in rollup["measures"]
+            },
+        )
+
+        if st.button("Collapse all", key="camp_rollup_collapse"):
+            st.session_state.camp_rollup_expanded = set()
+            st.rerun()
+
+    else:
+
+        df_cf = df_camp
+
+        if sel_nums:
+            df_cf = df_cf[df_cf["_MonthNum"].isin(sel_nums)]
+
+        df_cf = df_cf[camp_export_cols]
+
+        num_cols_c = df_cf.select_dtypes(include="number").columns.tolist()
+
+        show_table(
+            "campaign_summary",
+            df_cf,
+            totals=totals_frame(df_cf, "Channel", df_cf[num_cols_c].sum()),
+            column_config={
+                "ScheduleDate": st.column_config.DateColumn(
+                    format="DD-MMM-YYYY"
+                ),
+            },
+        )
+
+    export_buttons(
+        "campaign_summary",
+        lambda months=tuple(sel_nums), cols=camp_export_cols: iter_export_chunks(
+            df_camp,
+            mask=df_camp["_MonthNum"].isin(months) if months else None,
+            columns=cols,
+        ),
+        key="export_campaign",
+    )
+
+    st.caption("*Data Source: Creditas Database*")
+
+# ================================================================
+# SECTION 3A : CAMPAIGN FUNNEL
+# ================================================================
+funnel_cube = build_funnel_cube(df_camp, camp_snap["version"])
+
+with st.expander("Campaign Funnel", expanded=True):
+
+    df_funnel = funnel_for_months(funnel_cube, tuple(sorted(sel_nums)))
+
+    stage_names = [s for s, _ in FUNNEL_STAGES]
+    conv_cols = [f"{s} %" for s in stage_names[1:]]
+
+    fc1, fc2 = st.columns([1.5, 1.3])
+
+    with fc1:
+
+        channel_colors = [C_NAVY, C_BLUE, C_SKY, C_GREEN, C_AMBER]
+
+        fig_f = go.Figure()
+
+        by_channel = df_funnel[df_funnel["Dimension"] == "Channel"]
+
+        for i, (_, row) in enumerate(by_channel.iterrows()):
+            fig_f.add_trace(
+                go.Funnel(
+                    name=row["Key"],
+                    y=stage_names,
+                    x=row[stage_names].tolist(),
+                    textinfo="value+percent previous",
+                    marker_color=channel_colors[i % len(channel_colors)],
+                )
+            )
+
+        fig_f.update_layout(height=380, **CHART_LAYOUT)
+
+        st.plotly_chart(fig_f, use_container_width=True)
+
+    with fc2:
+
+        st.markdown(
+            '<div class="filter-label">Rank By</div>',
+            unsafe_allow_html=True,
+        )
+
+        funnel_dim = st.pills(
+            "funnel_dim",
+            FUNNEL_DIMENSIONS,
+            default="Channel",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="funnel_dim_pills",
+        ) or "Channel"
+
+        min_sent = st.number_input(
+            "Minimum Sent",
+            min_value=0,
+            value=0,
+            step=100,
+            key="funnel_min_sent",
+        )
+
+        ranked = (
+            df_funnel[
+                (df_funnel["Dimension"] == funnel_dim)
+                & (df_funnel["Sent"] >= min_sent)
+            ]
+            .drop(columns=["Dimension"])
+            .rename(columns={"Key": funnel_dim})
+            .sort_values("End-to-End %", ascending=False, na_position="last")
+        )
+
+        ranked.insert(0, "Rank", np.arange(1, len(ranked) + 1))
+
+        ranked = ranked[
+            ["Rank", funnel_dim, "Sent", "Activated", "Activated Later"]
+            + ["End-to-End %"]
+            + conv_cols
+            + ["Consent %"]
+        ]
+
+        # column_config keeps the columns numeric; a Styler would render
+        # every cell and hits Streamlit's styler cell limit at campaign level
+        show_table(
+            "campaign_funnel",
+            ranked,
+            height=380,
+            column_config={
+                "Sent": st.column_config.NumberColumn(format="localized"),
+                "Activated": st.column_config.NumberColumn(format="localized"),
+                "Activated Later": st.column_config.NumberColumn(
+                    format="localized"
+                ),
+                **{
+                    c: st.column_config.NumberColumn(format="%.2f%%")
+                    for c in ["End-to-End %", "Consent %"] + conv_cols
+                },
+            },
+        )
+
+    st.caption(
+        "*Stage % = conversion from the previous stage. Activated = same-day "
+        "activations only; Activated Later (different-day) is shown beside "
+        "the funnel and excluded from End-to-End %. "
+        "Consent % = Consent OTP / Consent CTA. Data Source: Creditas Database*"
+    )
 
-            df_pivot = df_pivot.reset_index()
+# ================================================================
+# CAMPAIGN SEARCH INDEX
+# ================================================================
+# Inverted index (token -> sorted row positions) over TemplateContent and
+# CampaignTitle, built once per snapshot version. Titles tokenize on "_"
+# like any other separator. Each distinct text is tokenized once.
+SEARCH_COLUMNS = ["TemplateContent", "CampaignTitle"]
 
-        else:
+SEARCH_TERM_RE = re.compile(r"[a-z0-9]+\*?")
 
-            df_pivot = pd.DataFrame(columns=["ReceivedDate"])
+SEARCH_RESULT_LIMIT = 500
 
-        df_cuid_base = df_filtered.groupby(
-            "ReceivedDate",
-            as_index=False,
-        )["Total_CUID"].sum()
 
-        df_grouped = (
-            df_pivot.merge(
-                df_cuid_base,
-                on="ReceivedDate",
-                how="left",
+def search_tokens(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+# per partner: current + refreshing version
+@st.cache_resource(show_spinner=False, max_entries=2 * len(PARTNERS))
+def campaign_search_index(_df, version):
+    postings = {}
+
+    for col in SEARCH_COLUMNS:
+        if col not in _df.columns:
+            continue
+
+        codes, texts = pd.factorize(_df[col].fillna("").astype(str))
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(texts) + 1))
+
+        for u, text in enumerate(texts):
+            rows = order[bounds[u]:bounds[u + 1]]
+            for tok in set(search_tokens(text)):
+                postings.setdefault(tok, []).append(rows)
+
+    index = {
+        tok: np.unique(np.concatenate(parts)) for tok, parts in postings.items()
+    }
+
+    return index, sorted(index)
+
+
+def search_campaign_rows(df, version, query):
+    # Rows matching every term; "term*" matches by prefix. Terms typed with
+    # "_" (e.g. strat_1) must also appear verbatim, checked on the matches.
+    index, vocab = campaign_search_index(df, version)
+    empty = np.array([], dtype=np.int64)
+
+    postings = []
+
+    for term in SEARCH_TERM_RE.findall(query.lower()):
+        if term.endswith("*"):
+            lo = bisect.bisect_left(vocab, term[:-1])
+            hi = bisect.bisect_left(vocab, term[:-1] + "\uffff")
+            rows = (
+                np.unique(np.concatenate([index[t] for t in vocab[lo:hi]]))
+                if hi > lo
+                else empty
             )
-            .sort_values("ReceivedDate")
-        )
+        else:
+            rows = index.get(term, empty)
 
-        act_grp = df_act.groupby(
-            "ReceivedDate",
-            as_index=False,
-        )["Total_Activation"].sum()
+        postings.append(rows)
 
-        df_grouped = df_grouped.merge(
-            act_grp,
-            on="ReceivedDate",
-            how="left",
+    if not postings:
+        return empty
+
+    postings.sort(key=len)
+    rows = postings[0]
+
+    for other in postings[1:]:
+        rows = np.intersect1d(rows, other, assume_unique=True)
+
+    phrases = [w for w in query.lower().split() if "_" in w]
+
+    if phrases and len(rows):
+        text = (
+            df.iloc[rows][[c for c in SEARCH_COLUMNS if c in df.columns]]
+            .fillna("")
+            .astype(str)
+            .agg(" ".join, axis=1)
+            .str.lower()
         )
+        keep = np.ones(len(rows), dtype=bool)
+        for phrase in phrases:
+            keep &= text.str.contains(phrase, regex=False).to_numpy()
+        rows = rows[keep]
 
-    else:
+    return rows
 
-        date_col = "AccountOpeningDate"
 
-        df_cuid_base = df_filtered.groupby(
-            date_col,
-            as_index=False,
-        )["Total_CUID"].sum()
+# ================================================================
+# SECTION 3B : CAMPAIGN SEARCH
+# ================================================================
+with st.expander("Campaign Search", expanded=True):
 
-        numeric_cols = df_act.select_dtypes(include="number").columns
+    search_query = st.text_input(
+        "Search campaigns",
+        placeholder="e.g. times prime  ·  hypsb strat_1  ·  cashb*",
+        key="campaign_search",
+    )
 
-        df_grouped = (
-            df_act.groupby(date_col, as_index=False)[numeric_cols]
-            .sum()
-            .sort_values(date_col)
+    if search_query.strip():
+
+        started = time.perf_counter()
+
+        hit_rows = search_campaign_rows(
+            df_camp, camp_snap["version"], search_query
         )
 
-        df_grouped = (
-            df_grouped.drop(columns=["Total_CUID"], errors="ignore")
-            .merge(df_cuid_base, on=date_col, how="left")
+        df_hits = df_camp.iloc[hit_rows]
+
+        if sel_nums:
+            df_hits = df_hits[df_hits["_MonthNum"].isin(sel_nums)]
+
+        hit_measures = FUNNEL_STAGES + [
+            ("Activated Later", dict(FUNNEL_BRANCHES)["Activated Later"])
+        ]
+        stage_names = [s for s, _ in hit_measures]
+
+        df_hits = df_hits.assign(
+            **{
+                stage: df_hits.reindex(columns=cols).fillna(0).sum(axis=1)
+                for stage, cols in hit_measures
+            }
         )
 
-    cols_remove = [
-        "CreditasActivated",
-        "BankActivated",
-        "OverallActivated",
-        "MonthYear",
-        "MonthYearLabel",
-        "ProductCode",
-        "ProductDesc",
-        "ReceivedDate",
-        "ActivationDate",
-        "BankActivatedDate",
-        "OverallActivatedDate",
-        "AccountOpeningDate",
-    ]
+        hits = (
+            df_hits.groupby("CampaignTitle", as_index=False)
+            .agg(
+                Channel=("Channel", lambda x: ", ".join(sorted(set(x)))),
+                Category=("TemplateCategory", "first"),
+                Runs=("CampaignTitle", "size"),
+                First=("ScheduleDate", "min"),
+                Last=("ScheduleDate", "max"),
+                **{s: (s, "sum") for s in stage_names},
+                Template=("TemplateContent", "first"),
+            )
+            .sort_values("Sent", ascending=False)
+        )
 
-    cols_remove = [c for c in cols_remove if c != date_col]
+        hits["End-to-End %"] = (
+            hits["Activated"] / hits["Sent"].replace(0, np.nan) * 100
+        ).round(2)
 
-    df_display = df_grouped.drop(columns=cols_remove, errors="ignore")
+        elapsed_ms = (time.perf_counter() - started) * 1000
 
-    priority = [date_col, "Total_CUID"]
+        st.caption(
+            f"{len(hits):,} campaigns ({len(df_hits):,} runs) "
+            f"in {elapsed_ms:.0f} ms"
+            + (
+                f" · showing top {SEARCH_RESULT_LIMIT} by Sent"
+                if len(hits) > SEARCH_RESULT_LIMIT
+                else ""
+            )
+        )
 
-    df_display = df_display[
-        priority + [c for c in df_display.columns if c not in priority]
-    ]
+        show_table(
+            "campaign_search",
+            hits.head(SEARCH_RESULT_LIMIT)[
+                ["CampaignTitle", "Channel", "Category", "Runs", "First", "Last"]
+                + stage_names
+                + ["End-to-End %", "Template"]
+            ],
+            column_config={
+                "First": st.column_config.DateColumn(format="DD MMM YYYY"),
+                "Last": st.column_config.DateColumn(format="DD MMM YYYY"),
+                "End-to-End %": st.column_config.NumberColumn(format="%.2f%%"),
+                **{
+                    s: st.column_config.NumberColumn(format="localized")
+                    for s in stage_names
+                },
+            },
+        )
 
-    df_display[date_col] = df_display[date_col].astype(str)
+    st.caption("*Searches the months selected in Campaign Summary.*")
 
-    day_columns = [c for c in df_display.columns if c.startswith("Day")]
+# ================================================================
+# CAMPAIGN ATTRIBUTION ENGINE
+# ================================================================
+# Links the campaign table to activations. Each activation day is matched,
+# per channel, to that channel's most recent campaign day on or before it
+# (as-of join: np.searchsorted over the channel's sorted campaign days),
+# provided it is no more than `window` days earlier. The day's activations
+# are split evenly across the channels that match and, within a channel,
+# over that day's campaigns by Sent. Days with no match stay unattributed.
+# Campaign times are ignored: activations only carry a date. The match is
+# cached per data version and view; the window is applied on read.
+ATTRIBUTION_WINDOW_DAYS = int(os.getenv("IBL_ATTRIBUTION_WINDOW_DAYS", "7"))
+ATTRIBUTION_MAX_WINDOW_DAYS = 30
+
+
+# per partner: 3 views x (current + refreshing) version
+@st.cache_data(show_spinner=False, max_entries=6 * len(PARTNERS))
+def campaign_matches(_ext, ext_version, _camp, camp_version, view):
+    # Window-independent part: daily activations and, per channel, the
+    # latest campaign day on or before each of them with its gap in days.
+    flag, act_col = ACTIVATION_VIEWS[view]
+
+    # activations per day, as sorted int day codes
+    act_days = (
+        pd.to_datetime(_ext[act_col], errors="coerce")
+        .to_numpy()
+        .astype("datetime64[D]")
+    )
+    weight = _ext[flag].where(_ext[flag] >= 1, 0).to_numpy(dtype="float64")
+    valid = ~np.isnat(act_days) & (weight > 0)
 
-    metric_cols = df_display.select_dtypes(include="number").columns
+    days, inverse = np.unique(
+        act_days[valid].astype(np.int64), return_inverse=True
+    )
+    activations = np.bincount(inverse, weights=weight[valid])
+
+    camp = _camp[_camp["ScheduleDate"].notna()]
+    camp_days = (
+        camp["ScheduleDate"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    )
+    sent = pd.to_numeric(camp["Sent"], errors="coerce").fillna(0).to_numpy()
+    channel_codes, channels = pd.factorize(
+        camp["Channel"].fillna("Unknown"), sort=True
+    )
 
-    raw_totals = df_display.head(100)[metric_cols].sum()
+    matches = []
 
-    if view_mode == "Activation %":
+    for c in range(len(channels)):
+        rows = np.flatnonzero(channel_codes == c)
+        batch_days = np.unique(camp_days[rows])
+
+        last = np.searchsorted(batch_days, days, side="right") - 1
+        gap = np.where(
+            last >= 0,
+            days - batch_days[np.maximum(last, 0)],
+            np.iinfo(np.int64).max,
+        )
 
-        df_view = df_display.copy()
+        row_batch = np.searchsorted(batch_days, camp_days[rows])
+        batch_sent = np.bincount(
+            row_batch, weights=sent[rows], minlength=len(batch_days)
+        )[row_batch]
+        batch_runs = np.bincount(row_batch, minlength=len(batch_days))[row_batch]
+
+        # share of its campaign day's credit that each run receives
+        run_weight = np.where(
+            batch_sent > 0,
+            sent[rows] / np.where(batch_sent > 0, batch_sent, 1),
+            1 / batch_runs,
+        )
 
-        for col in day_columns:
-            df_view[col] = (
-                df_view[col]
-                / df_view["Total_Activation"].replace(0, 1)
-            ) * 100
+        matches.append(
+            {
+                "rows": rows,
+                "n_batches": len(batch_days),
+                "last": last,
+                "gap": gap,
+                "row_batch": row_batch,
+                "run_weight": run_weight,
+            }
+        )
 
-        df_view[day_columns] = df_view[day_columns].round(2)
+    reported = (
+        camp.reindex(columns=["Card_Activated_SameDay", "Card_Activated_DiffDay"])
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .sum(axis=1)
+    )
 
-        for col in day_columns:
-            df_view[col] = df_view[col].astype(str) + "%"
+    runs = pd.DataFrame(
+        {
+            "Channel": camp["Channel"].to_numpy(),
+            "CampaignTitle": camp["CampaignTitle"].to_numpy(),
+            "_MonthNum": camp["_MonthNum"].to_numpy(),
+            "Sent": sent,
+            "Reported Activated": reported.to_numpy(),
+        }
+    )
 
-        denom = raw_totals.get("Total_Activation", 1) or 1
+    return {
+        "days": days,
+        "activations": activations,
+        "span": (
+            (camp_days.min(), camp_days.max()) if len(camp_days) else None
+        ),
+        "channels": list(channels),
+        "matches": matches,
+        "runs": runs,
+    }
 
-        total_row = raw_totals.copy().astype(object)
-        total_row[date_col] = "Total"
 
-        for col in day_columns:
-            total_row[col] = f"{round(raw_totals[col]/denom*100,2)}%"
+def campaign_attribution(matched, window):
+    # Applies the window to the cached match; linear numpy, no regrouping
+    days, activations = matched["days"], matched["activations"]
 
+    # only the days the campaign data can explain
+    if matched["span"] is not None:
+        first, last_day = matched["span"]
+        span = (days >= first) & (days <= last_day + window)
     else:
+        span = np.zeros(len(days), dtype=bool)
 
-        df_view = df_display.copy()
+    hits = [m["gap"][span] <= window for m in matched["matches"]]
+    activations = activations[span]
 
-        total_row = raw_totals.copy().astype(object)
-        total_row[date_col] = "Total"
+    n_hit = np.sum(hits, axis=0) if hits else np.zeros(len(activations))
+    share = np.where(n_hit > 0, activations / np.maximum(n_hit, 1), 0.0)
 
-    df_with_total = pd.concat(
-        [df_view.head(100), pd.DataFrame([total_row])],
-        ignore_index=True,
-    )
+    credit = np.zeros(len(matched["runs"]))
+    daily = {"Date": days[span].astype("datetime64[D]")}
 
-    st.dataframe(
-        df_with_total,
-        use_container_width=True,
-        hide_index=True,
-    )
+    for channel, m, hit in zip(matched["channels"], matched["matches"], hits):
+        batch_credit = np.bincount(
+            m["last"][span][hit], weights=share[hit], minlength=m["n_batches"]
+        )
+
+        credit[m["rows"]] = batch_credit[m["row_batch"]] * m["run_weight"]
+
+        daily[channel] = np.where(hit, share, 0.0)
+
+    daily["Unattributed"] = np.where(n_hit > 0, 0.0, activations)
+
+    return {
+        "runs": matched["runs"].assign(Attributed=credit),
+        "daily": pd.DataFrame(daily),
+        "channels": matched["channels"],
+    }
 
-    st.caption("*Data Source: Creditas DataBase*")
 
 # ================================================================
-# SECTION 3 : CAMPAIGN SUMMARY
+# SECTION 3C : CAMPAIGN ATTRIBUTION
 # ================================================================
-df_camp = get_data(
-    """
-SELECT * FROM Data_IBL_Dashboard_3
-"""
-)
-
-df_camp["ScheduleDate"] = pd.to_datetime(df_camp["ScheduleDate"])
+with st.expander("Campaign Attribution", expanded=False):
 
-df_camp["_MonthNum"] = (
-    df_camp["ScheduleDate"].dt.strftime("%Y%m").astype(int)
-)
+    a1, a2 = st.columns([2, 1.2])
 
-df_camp["_MonthLabel"] = df_camp["ScheduleDate"].dt.strftime("%b'%y")
+    with a1:
 
-cm_map = dict(zip(df_camp["_MonthLabel"], df_camp["_MonthNum"]))
-cm_rev = {v: k for k, v in cm_map.items()}
+        st.markdown(
+            '<div class="filter-label">Activation View</div>',
+            unsafe_allow_html=True,
+        )
 
-_cm_order = (
-    df_camp[["_MonthLabel", "_MonthNum"]]
-    .drop_duplicates()
-    .dropna()
-    .sort_values("_MonthNum")
-)
+        attr_view = st.pills(
+            "attr_view",
+            list(ACTIVATION_VIEWS),
+            default="Overall Activated",
+            selection_mode="single",
+            label_visibility="collapsed",
+            key="attr_view_pills",
+        ) or "Overall Activated"
 
-cm_sorted = _cm_order["_MonthLabel"].tolist()
-cm_latest = cm_rev.get(df_camp["_MonthNum"].max())
+    with a2:
 
-with st.expander("Campaign Summary", expanded=True):
+        attr_window = st.slider(
+            "Attribution window (days)",
+            min_value=0,
+            max_value=ATTRIBUTION_MAX_WINDOW_DAYS,
+            value=ATTRIBUTION_WINDOW_DAYS,
+            key="attr_window_slider",
+        )
 
-    st.markdown(
-        '<div class="filter-label">Month Year</div>',
-        unsafe_allow_html=True,
+    attribution = campaign_attribution(
+        campaign_matches(
+            df_external,
+            ext_snap["version"],
+            df_camp,
+            camp_snap["version"],
+            attr_view,
+        ),
+        attr_window,
     )
 
-    camp_sel = st.pills(
-        "camp_month",
-        cm_sorted,
-        default=[cm_latest] if cm_latest else None,
-        selection_mode="multi",
-        label_visibility="collapsed",
-        key="camp_month_pills",
-    )
+    df_attr_daily = attribution["daily"]
+    attr_channels = attribution["channels"]
 
-    sel_nums = [cm_map[l] for l in camp_sel] if camp_sel else []
+    attr_total = df_attr_daily[attr_channels + ["Unattributed"]].to_numpy().sum()
+    attr_unmatched = df_attr_daily["Unattributed"].sum()
 
-    df_cf = df_camp.copy()
+    m1, m2, *m_channels = st.columns(2 + len(attr_channels))
 
-    if sel_nums:
-        df_cf = df_cf[df_cf["_MonthNum"].isin(sel_nums)]
-
-    df_cf = df_cf.drop(
-        columns=[
-            "Unnamed: 0",
-            "TemplateContent",
-            "LongUrl",
-            "Category",
-            "_MonthNum",
-            "_MonthLabel",
-            "CampaignId",
-            "TemplateId",
-            "Last_5_Fail",
-            "Last_3_Fail",
-            "Click",
-            "BotClicks",
-            "NotBotClicks",
-        ],
-        errors="ignore",
-    )
+    with m1:
+        st.metric("Activations in campaign span", f"{attr_total:,.0f}")
 
-    df_cf["ScheduleDate"] = df_cf["ScheduleDate"].dt.strftime("%d-%b-%Y")
+    with m2:
+        st.metric(
+            "Attributed",
+            f"{(attr_total - attr_unmatched) / attr_total * 100:.1f}%"
+            if attr_total
+            else "–",
+        )
 
-    num_cols_c = df_cf.select_dtypes(include="number").columns.tolist()
+    for col, channel in zip(m_channels, attr_channels):
+        with col:
+            st.metric(channel, f"{df_attr_daily[channel].sum():,.0f}")
 
-    total_row_c = df_cf[num_cols_c].sum().astype(object)
-    total_row_c["Channel"] = "Total"
+    fig = go.Figure()
 
-    for col in df_cf.columns:
-        if col not in num_cols_c and col != "Channel":
-            total_row_c[col] = ""
+    attr_palette = [C_NAVY, C_BLUE, C_SKY, C_GREEN, C_AMBER]
 
-    df_camp_display = pd.concat(
-        [df_cf, pd.DataFrame([total_row_c])],
-        ignore_index=True,
-    )
+    for i, channel in enumerate(attr_channels + ["Unattributed"]):
+        color = (
+            attr_palette[i % len(attr_palette)]
+            if channel != "Unattributed"
+            else C_BORDER
+        )
 
-    st.dataframe(
-        df_camp_display,
-        use_container_width=True,
-        hide_index=True,
+        fig.add_trace(
+            go.Bar(
+                x=df_attr_daily["Date"],
+                y=df_attr_daily[channel],
+                name=channel,
+                marker_color=color,
+                marker_line_width=0,
+            )
+        )
+
+    fig.update_layout(
+        barmode="stack",
+        height=300,
+        bargap=0.1,
+        yaxis=dict(
+            title="Activations",
+            title_font=dict(size=11),
+            tickfont=dict(size=10),
+            gridcolor="#F0F0F0",
+        ),
+        xaxis=dict(tickfont=dict(size=10)),
+        **CHART_LAYOUT,
     )
 
-    st.caption("*Data Source: Creditas Database*")
+    st.plotly_chart(fig, use_container_width=True)
 
-# ================================================================
-# SECTION 4 : PRODUCT-WISE ACTIVATION SUMMARY
-# ================================================================
-df_prod = df_external.copy()
+    df_attr = attribution["runs"]
 
-df_prod["AccountOpeningDate"] = pd.to_datetime(
-    df_prod["AccountOpeningDate"]
-)
+    if sel_nums:
+        df_attr = df_attr[df_attr["_MonthNum"].isin(sel_nums)]
 
-df_prod["ReceivedDate"] = pd.to_datetime(df_prod["ReceivedDate"])
+    df_attr = (
+        df_attr.groupby(["Channel", "CampaignTitle"], as_index=False)[
+            ["Sent", "Attributed", "Reported Activated"]
+        ]
+        .sum()
+        .sort_values("Attributed", ascending=False)
+    )
 
-mp = df_prod["ReceivedDate"] < df_prod["AccountOpeningDate"]
+    df_attr["Attributed / 1k Sent"] = (
+        df_attr["Attributed"] / df_attr["Sent"].replace(0, np.nan) * 1000
+    )
 
-df_prod.loc[mp, "ReceivedDate"] = df_prod.loc[
-    mp,
-    "AccountOpeningDate",
-]
+    show_table(
+        "campaign_attribution",
+        df_attr,
+        column_config={
+            "Sent": st.column_config.NumberColumn(format="localized"),
+            "Attributed": st.column_config.NumberColumn(format="%.1f"),
+            "Reported Activated": st.column_config.NumberColumn(
+                format="localized"
+            ),
+            "Attributed / 1k Sent": st.column_config.NumberColumn(
+                format="%.2f"
+            ),
+        },
+    )
 
-df_prod["_MonthLabel"] = df_prod["MonthYear"].apply(fmt_month)
+    st.caption(
+        f"*Each day's {attr_view.lower()} are credited to the latest campaign "
+        f"day per channel within {attr_window} days before it, split across "
+        "matching channels and by Sent within a day. Table shows the months "
+        "selected in Campaign Summary.*"
+    )
+
+# ================================================================
+# SECTION 4 : PRODUCT-WISE ACTIVATION SUMMARY
+# ================================================================
+# snapshot dates are already parsed and ReceivedDate already clamped to
+# AccountOpeningDate (prepare_external), so the frame is used as-is
+df_prod = df_external
 
-pm_map = dict(zip(df_prod["_MonthLabel"], df_prod["MonthYear"]))
+pm_map = dict(zip(df_prod["MonthYearLabel"], df_prod["MonthYear"]))
 pm_rev = {v: k for k, v in pm_map.items()}
 
 _pm_order = (
-    df_prod[["_MonthLabel", "MonthYear"]]
+    df_prod[["MonthYearLabel", "MonthYear"]]
     .drop_duplicates()
     .dropna()
     .sort_values("MonthYear")
 )
 
-pm_labels = _pm_order["_MonthLabel"].tolist()
+pm_labels = _pm_order["MonthYearLabel"].tolist()
 pm_latest = pm_rev.get(df_prod["MonthYear"].max())
 
 with st.expander("Product-wise Activation Summary", expanded=True):
 
-    st.markdown(
-        '<div class="filter-label">Month Year</div>',
-        unsafe_allow_html=True,
-    )
+    pa_col, pb_col = st.columns([0.8, 3.2])
 
-    prod_sel = st.pills(
-        "prod_month",
-        pm_labels,
-        default=[pm_latest] if pm_latest else None,
-        selection_mode="multi",
-        label_visibility="collapsed",
-        key="prod_month_pills",
-    )
+    with pa_col:
+
+        prod_period = st.radio(
+            "Period",
+            ["Month Year", "Date Range"],
+            horizontal=True,
+            key="prod_period_mode",
+        )
+
+        if prod_period == "Date Range":
+            prod_range_view = st.pills(
+                "prod_range_col",
+                ["Account Opening Date", "Received Date"],
+                default="Account Opening Date",
+                selection_mode="single",
+                label_visibility="collapsed",
+                key="prod_range_col_pills",
+            )
+
+    with pb_col:
+
+        pm_nums = []
+
+        if prod_period == "Date Range":
+
+            prod_range_col = (
+                "ReceivedDate"
+                if prod_range_view == "Received Date"
+                else "AccountOpeningDate"
+            )
+
+            st.markdown(
+                '<div class="filter-label">Date Range</div>',
+                unsafe_allow_html=True,
+            )
+
+            prod_start, prod_end = date_range_picker(
+                df_prod, ext_snap["version"], prod_range_col, key="prod"
+            )
+
+        else:
+
+            st.markdown(
+                '<div class="filter-label">Month Year</div>',
+                unsafe_allow_html=True,
+            )
+
+            prod_sel = st.pills(
+                "prod_month",
+                pm_labels,
+                default=[pm_latest] if pm_latest else None,
+                selection_mode="multi",
+                label_visibility="collapsed",
+                key="prod_month_pills",
+            )
 
-    pm_nums = [pm_map[l] for l in prod_sel] if prod_sel else []
+            pm_nums = [pm_map[l] for l in prod_sel] if prod_sel else []
 
-    df_pf = df_prod.copy()
+    if prod_period == "Date Range":
+        df_pf = date_range_slice(
+            df_prod,
+            ext_snap["version"],
+            prod_range_col,
+            prod_start,
+            prod_end,
+        )
+    else:
+        df_pf = df_prod
 
     if pm_nums:
         df_pf = df_pf[df_pf["MonthYear"].isin(pm_nums)]
@@ -972,62 +3823,154 @@ with st.expander("Product-wise Activation Summary", expanded=True):
         ascending=False,
     )
 
-    total_p = prod_summary.select_dtypes(include="number").sum().astype(
-        object
-    )
+    total_p = prod_summary.select_dtypes(include="number").sum()
 
-    total_p["Product"] = "Total"
     total_p["Allocation %"] = 100.0
 
-    total_p["Creditas Activation %"] = round(
-        prod_summary["Creditas Activated"].sum() / gc * 100,
-        2,
-    )
+    for prod_view in ["Creditas", "Bank", "Overall"]:
+        total_p[f"{prod_view} Activation %"] = round(
+            prod_summary[f"{prod_view} Activated"].sum() / gc * 100,
+            2,
+        )
 
-    total_p["Bank Activation %"] = round(
-        prod_summary["Bank Activated"].sum() / gc * 100,
-        2,
+    show_table(
+        "product_activation",
+        prod_summary,
+        totals=totals_frame(prod_summary, "Product", total_p),
+        column_config={
+            **{
+                c: st.column_config.NumberColumn(format="localized")
+                for c in display_cols
+                if not c.endswith("%") and c != "Product"
+            },
+            **{
+                c: st.column_config.NumberColumn(format="%.2f%%")
+                for c in display_cols
+                if c.endswith("%")
+            },
+        },
     )
 
-    total_p["Overall Activation %"] = round(
-        prod_summary["Overall Activated"].sum() / gc * 100,
-        2,
+    export_buttons(
+        "product_activation",
+        lambda df=prod_summary: iter_export_chunks(df),
+        key="export_product",
     )
 
-    df_prod_display = pd.concat(
-        [prod_summary, pd.DataFrame([total_p])],
-        ignore_index=True,
-    )
+    st.caption("*Data Source: Creditas Database*")
 
-    styled_prod = (
-        df_prod_display.style.format(
-            {
-                "Total CUID": "{:,.0f}",
-                "Allocation %": "{:.2f}%",
-                "Creditas Activated": "{:,.0f}",
-                "Creditas Activation %": "{:.2f}%",
-                "Bank Activated": "{:,.0f}",
-                "Bank Activation %": "{:.2f}%",
-                "Overall Activated": "{:,.0f}",
-                "Overall Activation %": "{:.2f}%",
-            },
-            na_rep="",
+# ---- Profiling (sidebar, admin only) ----
+if is_admin:
+    with st.sidebar:
+        st.markdown("#### Profiling")
+
+        if st.session_state.get("profile_armed"):
+            st.caption("Profiling this run…")
+        elif st.button("Profile next rerun", use_container_width=True):
+            st.session_state.profile_armed = True
+            st.rerun()
+
+        saved_profiles = list_profiles()
+
+        if saved_profiles:
+            chosen = st.selectbox(
+                "Saved profiles",
+                saved_profiles,
+                key="profile_choice",
+            )
+
+            chosen_base = os.path.join(partner_profile_dir, chosen)
+
+            with open(chosen_base + ".json") as f:
+                profile_meta = json.load(f)
+
+            st.caption(
+                f"{profile_meta['seconds']:.2f}s · "
+                f"{profile_meta['samples']} samples · {profile_meta['user']}"
+                + ("" if profile_meta.get("complete", True) else " · ended early")
+            )
+
+            st.dataframe(
+                pd.DataFrame(
+                    profile_meta["top_self"],
+                    columns=["Frame", "Samples"],
+                ),
+                use_container_width=True,
+                hide_index=True,
+                height=200,
+            )
+
+            with st.expander("Filter state"):
+                st.json(profile_meta["filters"])
+
+            for ext, mime in [("html", "text/html"), ("folded", "text/plain")]:
+                with open(chosen_base + "." + ext, "rb") as f:
+                    st.download_button(
+                        f"Download {ext}",
+                        data=f.read(),
+                        file_name=f"{chosen}.{ext}",
+                        mime=mime,
+                        on_click="ignore",
+                        key=f"profile_dl_{ext}",
+                        use_container_width=True,
+                    )
+
+# ---- Data freshness (sidebar) ----
+with st.sidebar:
+    st.markdown("#### Data Refresh")
+
+    for (snap_partner, key), snap in list(data_store()["tables"].items()):
+        if snap_partner != partner:
+            continue
+
+        table = partner_cfg["tables"][key]
+        refreshed = datetime.datetime.fromtimestamp(snap["refreshed_at"])
+
+        st.caption(
+            f"**{table}** · v{snap['version']} · "
+            f"{refreshed:%d %b %H:%M:%S} · {snap['duration']:.1f}s"
         )
-        .set_table_styles(TABLE_HEADER_STYLE)
-        .hide(axis="index")
-    )
 
-    st.dataframe(styled_prod, use_container_width=True, hide_index=True)
+        if snap["error"]:
+            st.caption(f":red[Last refresh failed: {snap['error']}]")
 
-    st.caption("*Data Source: Creditas Database*")
+# ---- Table payloads (sidebar) ----
+if MEASURE_PAYLOADS and payload_stats:
+    with st.sidebar:
+        st.markdown("#### Table Payloads")
+
+        df_payloads = pd.DataFrame(payload_stats)
+
+        st.caption(
+            f"{df_payloads['KB'].sum():,.1f} KB · "
+            f"{df_payloads['ms'].sum():.1f} ms Arrow serialization this rerun"
+        )
+
+        st.dataframe(
+            df_payloads,
+            use_container_width=True,
+            hide_index=True,
+            height=200,
+            column_config={
+                "KB": st.column_config.NumberColumn(format="%.1f"),
+                "ms": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
 
 # ---- Footer ----
 st.markdown(
     f"""
 <div style="margin-top:40px;padding:16px 0;border-top:1px solid {C_BORDER};
 text-align:center;color:{C_MUTED};font-size:11px;letter-spacing:0.5px;">
-IBL BANK · Credit Card Activation Dashboard · Confidential
+{partner_cfg["name"]} · {partner_cfg["title"]} · Confidential
 </div>
 """,
     unsafe_allow_html=True,
-)
\ No newline at end of file
+)
+
+if "profile_run" in st.session_state:
+    saved = finish_sampler(
+        st.session_state.pop("profile_run"), st.session_state.username
+    )
+    st.session_state.profile_armed = False
+    st.toast(f"Profile saved: {os.path.basename(saved)}")